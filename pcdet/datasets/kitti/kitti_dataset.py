@@ -241,31 +241,43 @@ class KittiDataset(DatasetTemplate):
 
             if has_label:
                 obj_list = self.get_label(sample_idx)
+                num_objs = len(obj_list)
                 annotations = {}
                 annotations["name"] = np.array([obj.cls_type for obj in obj_list])
-                annotations["truncated"] = np.array(
-                    [obj.truncation for obj in obj_list]
+                # np.fromiter streams scalars straight into the target buffer
+                # instead of materializing an intermediate Python list
+                annotations["truncated"] = np.fromiter(
+                    (obj.truncation for obj in obj_list), np.float64, count=num_objs
                 )
-                annotations["occluded"] = np.array([obj.occlusion for obj in obj_list])
-                annotations["alpha"] = np.array([obj.alpha for obj in obj_list])
-                annotations["bbox"] = np.concatenate(
-                    [obj.box2d.reshape(1, 4) for obj in obj_list], axis=0
+                annotations["occluded"] = np.fromiter(
+                    (obj.occlusion for obj in obj_list), np.float64, count=num_objs
                 )
-                annotations["dimensions"] = np.array(
-                    [[obj.l, obj.h, obj.w] for obj in obj_list]
-                )  # lhw(camera) format
-                annotations["location"] = np.concatenate(
-                    [obj.loc.reshape(1, 3) for obj in obj_list], axis=0
+                annotations["alpha"] = np.fromiter(
+                    (obj.alpha for obj in obj_list), np.float64, count=num_objs
                 )
-                annotations["rotation_y"] = np.array(
-                    [
+                bbox = np.empty((num_objs, 4), dtype=np.float32)
+                dimensions = np.empty((num_objs, 3), dtype=np.float64)
+                location = np.empty((num_objs, 3), dtype=np.float32)
+                for i, obj in enumerate(obj_list):
+                    bbox[i] = obj.box2d
+                    dimensions[i] = (obj.l, obj.h, obj.w)  # lhw(camera) format
+                    location[i] = obj.loc
+                annotations["bbox"] = bbox
+                annotations["dimensions"] = dimensions
+                annotations["location"] = location
+                annotations["rotation_y"] = np.fromiter(
+                    (
                         (obj.ry if obj.ry >= -np.pi else (obj.ry + 2 * np.pi))
                         for obj in obj_list
-                    ]
+                    ),
+                    np.float64,
+                    count=num_objs,
                 )
-                annotations["score"] = np.array([obj.score for obj in obj_list])
-                annotations["difficulty"] = np.array(
-                    [obj.level for obj in obj_list], np.int32
+                annotations["score"] = np.fromiter(
+                    (obj.score for obj in obj_list), np.float64, count=num_objs
+                )
+                annotations["difficulty"] = np.fromiter(
+                    (obj.level for obj in obj_list), np.int32, count=num_objs
                 )
 
                 num_objects = len(
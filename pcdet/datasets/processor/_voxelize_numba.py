@@ -0,0 +1,104 @@
+import numba
+import numpy as np
+
+
+@numba.njit(cache=True, fastmath=True)
+def _voxelize_kernel(
+    points,
+    voxel_size,
+    coors_range,
+    grid_size,
+    max_points,
+    max_voxels,
+    voxels,
+    coords,
+    num_points,
+    voxel_map,
+):
+    """Scatter points into voxels with a dense grid hashmap.
+
+    voxel_map holds the voxel slot for every grid cell (-1 when empty) and
+    is cleaned up for the touched cells before returning, so the caller can
+    reuse the buffer across calls without re-filling the whole grid.
+    """
+    num_voxels = 0
+    for i in range(points.shape[0]):
+        gx = int((points[i, 0] - coors_range[0]) / voxel_size[0])
+        gy = int((points[i, 1] - coors_range[1]) / voxel_size[1])
+        gz = int((points[i, 2] - coors_range[2]) / voxel_size[2])
+        if (
+            gx < 0
+            or gx >= grid_size[0]
+            or gy < 0
+            or gy >= grid_size[1]
+            or gz < 0
+            or gz >= grid_size[2]
+        ):
+            continue
+        key = (gz * grid_size[1] + gy) * grid_size[0] + gx
+        voxel_idx = voxel_map[key]
+        if voxel_idx == -1:
+            if num_voxels >= max_voxels:
+                continue
+            voxel_idx = num_voxels
+            voxel_map[key] = voxel_idx
+            coords[voxel_idx, 0] = gz
+            coords[voxel_idx, 1] = gy
+            coords[voxel_idx, 2] = gx
+            num_voxels += 1
+        n = num_points[voxel_idx]
+        if n < max_points:
+            voxels[voxel_idx, n] = points[i]
+            num_points[voxel_idx] = n + 1
+
+    for j in range(num_voxels):
+        key = (coords[j, 0] * grid_size[1] + coords[j, 1]) * grid_size[0] + coords[
+            j, 2
+        ]
+        voxel_map[key] = -1
+    return num_voxels
+
+
+class NumbaVoxelGenerator(object):
+    """Drop-in replacement for spconv's VoxelGenerator built on numba.
+
+    Matches the generate(points) -> (voxels, coordinates, num_points)
+    interface with (z, y, x) coordinates, so the data processor can use it
+    unchanged when spconv is not installed.
+    """
+
+    def __init__(self, voxel_size, point_cloud_range, max_num_points, max_voxels):
+        self.voxel_size = np.asarray(voxel_size, dtype=np.float32)
+        self.point_cloud_range = np.asarray(point_cloud_range, dtype=np.float32)
+        self.max_num_points = max_num_points
+        self.max_voxels = max_voxels
+        grid_size = (
+            self.point_cloud_range[3:6] - self.point_cloud_range[0:3]
+        ) / self.voxel_size
+        self.grid_size = np.round(grid_size).astype(np.int64)
+        self._voxel_map = np.full(int(np.prod(self.grid_size)), -1, dtype=np.int32)
+
+    def generate(self, points):
+        voxels = np.zeros(
+            (self.max_voxels, self.max_num_points, points.shape[1]),
+            dtype=points.dtype,
+        )
+        coords = np.zeros((self.max_voxels, 3), dtype=np.int32)
+        num_points = np.zeros(self.max_voxels, dtype=np.int32)
+        num_voxels = _voxelize_kernel(
+            points,
+            self.voxel_size,
+            self.point_cloud_range,
+            self.grid_size,
+            self.max_num_points,
+            self.max_voxels,
+            voxels,
+            coords,
+            num_points,
+            self._voxel_map,
+        )
+        return (
+            voxels[:num_voxels],
+            coords[:num_voxels],
+            num_points[:num_voxels],
+        )
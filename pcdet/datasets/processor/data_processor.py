@@ -81,7 +81,11 @@ class DataProcessor(object):
             try:
                 from spconv.utils import VoxelGeneratorV2 as VoxelGenerator
             except:
-                from spconv.utils import VoxelGenerator
+                try:
+                    from spconv.utils import VoxelGenerator
+                except ImportError:
+                    # jitted fallback with the same generate() interface
+                    from ._voxelize_numba import NumbaVoxelGenerator as VoxelGenerator
 
             voxel_generator = VoxelGenerator(
                 voxel_size=config.VOXEL_SIZE,
@@ -183,6 +187,53 @@ class DataProcessor(object):
         return data_dict
 
 
+_gpu_voxel_generators = {}
+
+
+def _voxelize_on_gpu(
+    points, voxel_size, point_cloud_range, max_points, max_voxels, batch_size
+):
+    """Voxelize a collated (batch_idx, x, y, z, ...) tensor on its device.
+
+    Not wired into the batch path yet: the dataloader still voxelizes on
+    CPU, and nothing strips voxels from the batch. Kept private until a
+    caller in the training loop lands. One spconv PointToVoxel is kept
+    per device so its GPU buffers are allocated a single time.
+
+    Returns (voxels, coords, num_points) with coords carrying the batch
+    index in column 0, matching what collate_batch produces on CPU.
+    """
+    import torch
+    from spconv.pytorch.utils import PointToVoxel
+
+    key = str(points.device)
+    gen = _gpu_voxel_generators.get(key)
+    if gen is None:
+        gen = PointToVoxel(
+            vsize_xyz=list(voxel_size),
+            coors_range_xyz=list(point_cloud_range),
+            num_point_features=points.shape[1] - 1,
+            max_num_voxels=max_voxels,
+            max_num_points_per_voxel=max_points,
+            device=points.device,
+        )
+        _gpu_voxel_generators[key] = gen
+
+    voxels_list, coords_list, num_points_list = [], [], []
+    for i in range(batch_size):
+        cur_points = points[points[:, 0] == i, 1:]
+        voxels, coords, num_points = gen(cur_points)
+        coords = torch.nn.functional.pad(coords, (1, 0), value=i)
+        voxels_list.append(voxels)
+        coords_list.append(coords)
+        num_points_list.append(num_points)
+    return (
+        torch.cat(voxels_list, dim=0),
+        torch.cat(coords_list, dim=0),
+        torch.cat(num_points_list, dim=0),
+    )
+
+
 # class FusionProcessor(DataProcessor):
 #     def __init__(self, processor_configs, point_cloud_range, training):
 #         super().__init__(processor_configs, point_cloud_range, training)
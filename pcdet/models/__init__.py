@@ -37,10 +37,20 @@ def build_network(model_cfg, num_class, dataset):
 def load_data_to_gpu(batch_dict):
     for key, val in batch_dict.items():
         if key == "instances":
-            batch_dict[key] = [x.to(torch.cuda.current_device()) for x in val]
+            if hasattr(val, "to_instances"):
+                # dense BatchedInstances: one device transfer, then build
+                # the per-image Instances the heads expect
+                batch_dict[key] = val.to(torch.cuda.current_device()).to_instances()
+            else:
+                batch_dict[key] = [x.to(torch.cuda.current_device()) for x in val]
             continue
         elif key == "images":
-            v = torch.from_numpy(val).float().cuda()
+            if isinstance(val, torch.Tensor):
+                # collated into shared memory as uint8; upload the small
+                # form and convert to float on the device
+                v = val.cuda(non_blocking=True).float()
+            else:
+                v = torch.from_numpy(val).float().cuda()
             batch_dict[key] = ImageList(v, [x.shape[-2:] for x in v])
             continue
         elif not isinstance(val, np.ndarray):
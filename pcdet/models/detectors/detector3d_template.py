@@ -382,6 +382,10 @@ class Detector3DTemplate(nn.Module):
     ):
         if "gt_boxes" not in data_dict:
             return recall_dict
+        if data_dict["gt_boxes"].numel() == 0:
+            # inference on unlabeled data: nothing to match against, so skip
+            # the per-sample zero-box trimming and IoU kernels entirely
+            return recall_dict
 
         rois = data_dict["rois"][batch_index] if "rois" in data_dict else None
         gt_boxes = data_dict["gt_boxes"][batch_index]
@@ -1,6 +1,7 @@
+import os
 import pickle
-from collections import OrderedDict
-from typing import Dict, Any
+from collections import OrderedDict, defaultdict
+from typing import Dict, Any, Tuple
 
 import numpy as np
 import torch
@@ -16,6 +17,7 @@ from .detector3d_template import Detector3DTemplate
 from ..model_utils import model_nms_utils
 from ...utils.box_utils import (
     recover_boxes_2d,
+    recover_boxes_2d_batch,
     boxes_iou_normal,
     lidar_box_to_image_box,
     in_2d_box,
@@ -26,6 +28,100 @@ from pcdet.utils import debug_utils
 from torch.nn.functional import grid_sample
 
 
+@torch.jit.script
+def _fuse_scores(
+    cls_preds: torch.Tensor, cls_preds_2d: torch.Tensor, label_preds: torch.Tensor
+) -> torch.Tensor:
+    """Average 3D scores with the matching 2D foreground scores.
+
+    Scripted so the gather + add + div chain fuses into a single kernel
+    instead of three eager launches with intermediates; gather avoids
+    materializing an arange index per call.
+    """
+    cls_fg_2d = cls_preds_2d.gather(1, label_preds.view(-1, 1)).squeeze(1)
+    return (cls_preds + cls_fg_2d) / 2
+
+
+def _clip_boxes_2d(boxes_2d, image_shape):
+    """Clamp (N, 4) xyxy boxes to the image in place.
+
+    Same result as Boxes(...).clip(...) without constructing a Boxes
+    object per sample; the x/y pairs are clamped with one kernel each.
+    """
+    boxes_2d = boxes_2d.view(-1, 4)
+    boxes_2d[:, 0::2].clamp_(min=0, max=int(image_shape[1]))
+    boxes_2d[:, 1::2].clamp_(min=0, max=int(image_shape[0]))
+    return boxes_2d
+
+
+def _recover_and_clip_2d(boxes_2d, image_shape, new_shape):
+    """Undo the eval-time letterbox and clip to the image, all in place.
+
+    Folds recover_boxes_2d and the clip into one chain of strided
+    in-place ops on the (N, 4) tensor; the letterbox offsets and ratio
+    are python scalars, so no extra tensors are allocated per sample.
+    """
+    boxes_2d = boxes_2d.view(-1, 4)
+    height, width = int(image_shape[0]), int(image_shape[1])
+    if not np.allclose(image_shape, new_shape):
+        r = min(new_shape[0] / height, new_shape[1] / width)
+        dh = new_shape[0] - int(round(height * r))
+        dw = new_shape[1] - int(round(width * r))
+        boxes_2d[:, 0::2].sub_(dw // 2).div_(r)
+        boxes_2d[:, 1::2].sub_(dh // 2).div_(r)
+    boxes_2d[:, 0::2].clamp_(min=0, max=width)
+    boxes_2d[:, 1::2].clamp_(min=0, max=height)
+    return boxes_2d
+
+
+@torch.jit.script
+def _union_selections(
+    selected: torch.Tensor, box_keep2d: torch.Tensor, num_rois: int
+) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, int, int, int]:
+    """Sorted union of the 3D-NMS and 2D keep sets, with membership masks.
+
+    Membership flags are scattered over the full roi range and the sorted
+    union read straight off the joint mask. Scripted so the mask algebra
+    fuses instead of dispatching eagerly per op; the NMS producing
+    `selected` stays outside, where the hand-written kernel beats anything
+    the compiler emits.
+    """
+    in_3d = torch.zeros(num_rois, dtype=torch.bool, device=selected.device)
+    in_3d[selected] = True
+    in_2d = torch.zeros(num_rois, dtype=torch.bool, device=selected.device)
+    in_2d[box_keep2d] = True
+    joint_selected = (in_3d | in_2d).nonzero().squeeze(1)
+    in_3d = in_3d[joint_selected]
+    in_2d = in_2d[joint_selected]
+    only_in_3d = int((in_3d & ~in_2d).sum())
+    only_in_2d = int((in_2d & ~in_3d).sum())
+    both = int((in_3d & in_2d).sum())
+    return joint_selected, in_3d, in_2d, only_in_3d, only_in_2d, both
+
+
+def _stage_to_cpu(tensor):
+    """Kick off a non-blocking copy into pinned host memory.
+
+    The returned tensor is only valid after the stream is synchronized;
+    _finalize_pred_dicts does that once for the whole batch.
+    """
+    staged = torch.empty(
+        tensor.shape, dtype=tensor.dtype, pin_memory=tensor.is_cuda
+    )
+    staged.copy_(tensor, non_blocking=True)
+    return staged
+
+
+def _finalize_pred_dicts(pred_dicts):
+    """Resolve the staged 2D outputs to numpy with a single stream sync."""
+    if torch.cuda.is_available():
+        torch.cuda.current_stream().synchronize()
+    for record_dict in pred_dicts:
+        for key in ("pred_boxes2d", "pred_scores2d", "pred_labels2d"):
+            record_dict[key] = record_dict[key].numpy()
+    return pred_dicts
+
+
 class FusionRCNN(Detector3DTemplate):
     def __init__(self, model_cfg, num_class, dataset):
         if model_cfg.FREEZE_IMAGE_BRANCH:
@@ -34,6 +130,13 @@ class FusionRCNN(Detector3DTemplate):
         super().__init__(model_cfg=model_cfg, num_class=num_class, dataset=dataset)
         self.module_list = self.build_networks()
 
+        # batch_dict is a plain python dict carrying Instances/ImageList and
+        # numpy values, so the pipeline cannot be TorchScripted as a whole;
+        # dynamo traces through it with graph breaks and still fuses the
+        # elementwise tails, so offer it behind an opt-in flag
+        if self.model_cfg.get("TORCH_COMPILE", False) and hasattr(torch, "compile"):
+            self.module_list = [torch.compile(m) for m in self.module_list]
+
     def train(self, mode: bool = True):
         self.training = mode
         for module in self.children():
@@ -52,8 +155,25 @@ class FusionRCNN(Detector3DTemplate):
         # # TODO debug
         # debug_utils.save_image_with_instances(data_batch=batch_dict,)
         batch_dict["self_training_mode"] = self.model_cfg.get("SELF_TRAINING", False)
+        # frozen image backbone may run under fp16 autocast: it is
+        # inference-only so there are no gradient-precision concerns, and
+        # the fp32 cast below keeps the RPN/ROI heads in full precision
+        image_fp16 = (
+            self.model_cfg.get("IMAGE_BRANCH_FP16", False)
+            and self.model_cfg.FREEZE_IMAGE_BRANCH
+        )
         for cur_module in self.module_list:
-            batch_dict = cur_module(batch_dict)
+            if image_fp16 and cur_module is self.module_list[0]:
+                with torch.autocast("cuda", dtype=torch.float16):
+                    batch_dict = cur_module(batch_dict)
+                batch_dict["top_down_features"] = {
+                    k: v.float() for k, v in batch_dict["top_down_features"].items()
+                }
+                batch_dict["bottom_up_features"] = {
+                    k: v.float() for k, v in batch_dict["bottom_up_features"].items()
+                }
+            else:
+                batch_dict = cur_module(batch_dict)
 
         if self.training:
             loss, tb_dict, disp_dict = self.get_training_loss(batch_dict)
@@ -113,9 +233,6 @@ class FusionRCNN(Detector3DTemplate):
         #         #                             device=pred_boxes2d.device)
         #         # overlay_score = torch.zeros(*new_shape, dtype=torch.float,
         #         #                             device=pred_boxes2d.device)
-        #         pts_target = torch.zeros(len(single_pts_img), dtype=torch.float,
-        #                                  device=pred_boxes2d.device)
-        #
         #         wh_matrix = pred_boxes2d[:, 2:] - pred_boxes2d[:, :2]
         #         areas = torch.prod(wh_matrix, dim=1)
         #         sorted_idxs = torch.argsort(-areas)
@@ -124,21 +241,11 @@ class FusionRCNN(Detector3DTemplate):
         #         pred_masks2d = pred_masks2d[sorted_idxs]
         #         wh_matrix = wh_matrix[sorted_idxs]
         #
-        #         high_thresh = 0.6
-        #         low_thresh = 0.3
-        #         positive_indices = in_2d_box(single_pts_img, pred_boxes2d)
-        #         for idx, wh, pm, l2d, box in zip(positive_indices, wh_matrix, pred_masks2d, pred_labels2d.float(), pred_boxes2d):
-        #
-        #             pts_box = single_pts_img[idx]
-        #             pts_box[:, 0] = 2 * ((pts_box[:, 0] - box[0]) / wh[0]) - 1.0
-        #             pts_box[:, 1] = 2 * ((pts_box[:, 1] - box[1]) / wh[1]) - 1.0
-        #             assert (pts_box.min() >= -1 and pts_box.max() <= 1.0)
-        #             pts_box = pts_box[None, None, ...]
-        #             pm = pm[None, ...]
-        #             pts_score = grid_sample(pm, pts_box)
-        #             pts_score = torch.squeeze(pts_score)
-        #             pts_target[idx[pts_score > high_thresh]] = l2d
-        #             pts_target[idx[torch.logical_and(pts_score > low_thresh, pts_score < high_thresh)]] = -1
+        #         pts_target = self._assign_point_pseudo_labels(
+        #             single_pts_img, pred_boxes2d, wh_matrix,
+        #             pred_masks2d, pred_labels2d,
+        #             high_thresh=0.6, low_thresh=0.3,
+        #         )
         #         pts_target_list.append(pts_target)
         #
         #         pred_masks2d = retry_if_cuda_oom(paste_masks_in_image)(
@@ -182,6 +289,62 @@ class FusionRCNN(Detector3DTemplate):
 
         return loss, tb_dict, disp_dict
 
+    def _assign_point_pseudo_labels(
+        self,
+        pts_img,
+        pred_boxes2d,
+        wh_matrix,
+        pred_masks2d,
+        pred_labels2d,
+        high_thresh=0.6,
+        low_thresh=0.3,
+    ):
+        """Point pseudo-labels from 2D instance masks in one batched grid_sample.
+
+        Replaces the per-box reference loop (one tiny grid_sample launch per
+        box) with a single call sampling every mask at every point. Boxes are
+        expected sorted by descending area; where boxes overlap, the later
+        (smaller) box wins, matching the sequential loop's overwrite order.
+
+        Returns:
+            pts_target: (num_points,) float, class label for confident points,
+                -1 for ambiguous ones, 0 for background
+        """
+        num_boxes, num_points = pred_boxes2d.shape[0], pts_img.shape[0]
+        pts_target = pts_img.new_zeros(num_points)
+        if num_boxes == 0 or num_points == 0:
+            return pts_target
+
+        # one grid row per box over all points; points outside a box land
+        # outside [-1, 1] and read 0 through the zero padding, which never
+        # clears low_thresh
+        grid = (
+            2 * (pts_img[None, :, :] - pred_boxes2d[:, None, :2])
+            / wh_matrix[:, None, :]
+            - 1.0
+        )
+        scores = grid_sample(
+            pred_masks2d,  # (N, 1, M, M)
+            grid[:, None, :, :],
+            padding_mode="zeros",
+            align_corners=False,
+        )[:, 0, 0, :]  # (N, num_points)
+
+        # last write wins in the reference loop: keep the highest-index
+        # (smallest-area) box whose score clears the low threshold
+        box_idx = torch.arange(num_boxes, device=scores.device)[:, None]
+        winner = torch.where(scores > low_thresh, box_idx, -1).max(dim=0).values
+        matched = winner >= 0
+        winner = winner.clamp(min=0)
+        winner_scores = scores[winner, torch.arange(num_points, device=scores.device)]
+        labels = torch.where(
+            winner_scores > high_thresh,
+            pred_labels2d.float()[winner],
+            torch.full_like(winner_scores, -1.0),
+        )
+        pts_target[matched] = labels[matched]
+        return pts_target
+
     def split_parameters(self):
         """Retrun point branch parameters and image branch parameters
         Returns:
@@ -192,19 +355,18 @@ class FusionRCNN(Detector3DTemplate):
             RPN,
             StandardROIHeads,
         )
-        point_params = []
+        # single walk with an id set: self.parameters() already deduplicates
+        # shared parameters, so one membership test per parameter suffices
+        image_param_ids = {
+            id(p)
+            for module in self.modules()
+            if isinstance(module, image_branch_types)
+            for p in module.parameters()
+        }
+        point_params = [
+            p for p in self.parameters() if id(p) not in image_param_ids
+        ]
         image_params = []
-        memo = set()
-        for module in self.modules():
-            if isinstance(module, image_branch_types):
-                memo = memo.union(module.parameters())
-        for module in self.modules():
-            if isinstance(module, image_branch_types):
-                continue
-            for p in module.parameters(recurse=False):
-                if p not in memo:
-                    memo.add(p)
-                    point_params.append(p)
 
         image_params.extend(self.module_list[0].parameters())
         image_params.extend(self.module_list[3].image_roi_head.parameters())
@@ -228,14 +390,14 @@ class FusionRCNN(Detector3DTemplate):
         # model could be an OrderedDict with _metadata attribute
         # (as returned by Pytorch's state_dict()). We should preserve these
         # properties.
-        for k in list(state_dict.keys()):
-            v = state_dict[k]
-            if not isinstance(v, np.ndarray) and not isinstance(v, torch.Tensor):
+        for k, v in state_dict.items():
+            if type(v) is np.ndarray:
+                # zero-copy: the tensor aliases the array's buffer
+                state_dict[k] = torch.from_numpy(v)
+            elif not isinstance(v, torch.Tensor):
                 raise ValueError(
                     "Unsupported type found in checkpoint! {}: {}".format(k, type(v))
                 )
-            if not isinstance(v, torch.Tensor):
-                state_dict[k] = torch.from_numpy(v)
 
     def split_state_dict(self, state_dict: Dict[str, Any], prefix):
         gropu1 = OrderedDict()
@@ -247,6 +409,18 @@ class FusionRCNN(Detector3DTemplate):
                 gropu2[key] = value
         return gropu1, gropu2
 
+    @staticmethod
+    def partition_state_dict(state_dict: Dict[str, Any]):
+        """Bucket a state dict by the first dotted token of each key.
+
+        One pass replaces the repeated startswith splits over overlapping
+        supersets of the same checkpoint.
+        """
+        buckets = defaultdict(OrderedDict)
+        for key, value in state_dict.items():
+            buckets[key.split(".", 1)[0]][key] = value
+        return buckets
+
     def load_params_for_img_branch(self, logger):
         image_branch_weight = self.model_cfg.get("IMAGE_BRANCH_WEIGHT", "")
         if image_branch_weight != "":
@@ -291,26 +465,29 @@ class FusionRCNN(Detector3DTemplate):
                     raise NotImplementedError
 
             logger.info("Loading image branch weights from %s" % image_branch_weight)
-            with PathManager.open(image_branch_weight, "rb") as f:
-                image_branch_state_dict = pickle.load(f, encoding="latin1")
-
-            image_branch_state_dict = image_branch_state_dict.pop("model")
-            self._convert_ndarray_to_tensor(image_branch_state_dict)
-            image_backbone, others = self.split_state_dict(
-                image_branch_state_dict, prefix="backbone"
+            image_branch_state_dict = self._load_img_branch_state_dict(
+                image_branch_weight
             )
+            buckets = self.partition_state_dict(image_branch_state_dict)
+            image_backbone = buckets.pop("backbone", OrderedDict())
+            proposal_generator = buckets.pop("proposal_generator", OrderedDict())
+            roi_heads = OrderedDict()
+            for group in buckets.values():
+                roi_heads.update(group)
+
             _strip_prefix_if_present(image_backbone, "backbone.")
             self.module_list[0].load_state_dict(image_backbone, True)
 
-            proposal_generator, roi_heads = self.split_state_dict(
-                others, prefix="proposal_generator"
-            )
             _strip_prefix_if_present(proposal_generator, "proposal_generator.")
             _strip_prefix_if_present(roi_heads, "roi_heads.")
             if self.module_list[3].image_rpn is not None:
                 self.module_list[3].image_rpn.load_state_dict(proposal_generator, True)
             if self.model_cfg.ROI_HEAD.TRAIN_IMAGE_BOXHEAD:
-                _, roi_heads = self.split_state_dict(roi_heads, prefix="box_predictor")
+                roi_heads = OrderedDict(
+                    (key, value)
+                    for key, value in roi_heads.items()
+                    if not key.startswith("box_predictor")
+                )
                 logger.info("Train image box head, pop box_predictor weights")
             self.module_list[3].image_roi_head.load_state_dict(roi_heads, False)
             # swap the first channel
@@ -318,17 +495,44 @@ class FusionRCNN(Detector3DTemplate):
                 cls_score = self.module_list[3].image_roi_head.box_predictor.cls_score
 
                 # cls_score: Linear(in_features=1024,out_features=num_classes+1)
-                weight_copy = cls_score.weight.clone()
-                bias_copy = cls_score.bias.clone()
-                out_channels = cls_score.weight.shape[0]
+                # move the background channel from last to first in one roll
+                # instead of cloning weight/bias and copying twice
+                cls_score.weight.copy_(torch.roll(cls_score.weight, 1, 0))
+                cls_score.bias.copy_(torch.roll(cls_score.bias, 1, 0))
 
-                cls_score.weight[1:out_channels, ...] = weight_copy[: out_channels - 1]
-                cls_score.weight[0, ...] = weight_copy[-1, ...]
+            logger.info("Successfully load image branch weight!")
 
-                cls_score.bias[1:out_channels, ...] = bias_copy[: out_channels - 1]
-                cls_score.bias[0, ...] = bias_copy[-1, ...]
+    def _load_img_branch_state_dict(self, image_branch_weight):
+        """Load the detectron2 weight pkl, caching it as a .pth sidecar.
 
-            logger.info("Successfully load image branch weight!")
+        The pickle path deserializes every array into RAM before the
+        tensor conversion; subsequent runs read the converted sidecar
+        with torch.load instead, memory-mapped where the torch version
+        supports it.
+        """
+        cache_path = None
+        if image_branch_weight.endswith(".pkl"):
+            cache_path = image_branch_weight + ".pth"
+            if os.path.exists(cache_path) and os.path.getmtime(
+                cache_path
+            ) >= os.path.getmtime(image_branch_weight):
+                try:
+                    return torch.load(
+                        cache_path, map_location="cpu", mmap=True, weights_only=True
+                    )
+                except TypeError:  # torch without mmap/weights_only support
+                    return torch.load(cache_path, map_location="cpu")
+
+        with PathManager.open(image_branch_weight, "rb") as f:
+            state_dict = pickle.load(f, encoding="latin1")
+        state_dict = state_dict.pop("model")
+        self._convert_ndarray_to_tensor(state_dict)
+
+        if cache_path is not None:
+            tmp_path = cache_path + ".tmp.%d" % os.getpid()
+            torch.save(state_dict, tmp_path)
+            os.replace(tmp_path, cache_path)
+        return state_dict
 
     def load_params_from_file(self, filename, logger, to_cpu=False):
         super(FusionRCNN, self).load_params_from_file(filename, logger, to_cpu)
@@ -340,19 +544,46 @@ class FusionRCNN(Detector3DTemplate):
         pred_dicts, recall_dicts = super(FusionRCNN, self).post_processing(batch_dict)
         pred_instances = batch_dict["image_preds"]
         # TODO post processing pred mask
-        for image_shape, pred3d, pred2d in zip(
-            batch_dict["image_shape"], pred_dicts, pred_instances
-        ):
-            new_shape = np.array(pred2d.image_size)
-            pred_boxes2d = pred2d.get("pred_boxes").tensor.cpu().numpy()
-            pred_labels2d = pred2d.get("pred_classes").cpu().numpy()
-            pred_scores2d = pred2d.get("scores").cpu().numpy()
-            pred_boxes2d = recover_boxes_2d(pred_boxes2d, image_shape, new_shape)
+
+        # pack boxes/labels/scores of the whole batch into one flat tensor
+        # (all boxes first, then labels, then scores) and issue a single
+        # async D2H copy through pinned memory, instead of three
+        # synchronizing .cpu() calls per sample
+        boxes_list = [p.get("pred_boxes").tensor.reshape(-1) for p in pred_instances]
+        labels_list = [p.get("pred_classes").float() for p in pred_instances]
+        scores_list = [p.get("scores") for p in pred_instances]
+        counts = np.fromiter(
+            (b.numel() // 4 for b in boxes_list), np.int64, count=len(boxes_list)
+        )
+        total = int(counts.sum())
+        flat_gpu = torch.cat(boxes_list + labels_list + scores_list)
+        flat_cpu = torch.empty(
+            flat_gpu.shape, dtype=flat_gpu.dtype, pin_memory=flat_gpu.is_cuda
+        )
+        flat_cpu.copy_(flat_gpu, non_blocking=True)
+        if flat_gpu.is_cuda:
+            torch.cuda.current_stream().synchronize()
+        flat = flat_cpu.numpy()
+
+        all_boxes = flat[: 4 * total].reshape(-1, 4)
+        all_labels = flat[4 * total : 5 * total].astype(np.int64)
+        all_scores = flat[5 * total :]
+        # one vectorized un-letterbox pass over every box in the batch
+        all_boxes = recover_boxes_2d_batch(
+            all_boxes,
+            np.asarray(batch_dict["image_shape"]),
+            np.asarray([p.image_size for p in pred_instances]),
+            counts,
+        )
+
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        for i, pred3d in enumerate(pred_dicts):
+            start, end = offsets[i], offsets[i + 1]
             pred3d.update(
                 {
-                    "pred_boxes2d": pred_boxes2d,
-                    "pred_scores2d": pred_scores2d,
-                    "pred_labels2d": pred_labels2d,
+                    "pred_boxes2d": all_boxes[start:end],
+                    "pred_scores2d": all_scores[start:end],
+                    "pred_labels2d": all_labels[start:end],
                 }
             )
 
@@ -529,6 +760,39 @@ class FusionRCNN(Detector3DTemplate):
     #
     #     return pred_dicts, recall_dict
 
+    @staticmethod
+    def _cls2d_max(batch_dict, index):
+        """Foreground max over the 2D class scores, cached per sample.
+
+        Strategies 1-3 all reduce cls_preds_2d[:, 1:] with the background
+        column dropped; the result lives on batch_dict so sibling calls on
+        the same batch reuse it, and the slice is made contiguous so the
+        reduction runs on a stride-1 axis. The returned labels are 0-based
+        foreground indices: callers shift to 1-based class ids on their
+        post-selection subset instead of paying the add over the full roi
+        set.
+        """
+        cache = batch_dict.setdefault("_cls2d_max_cache", {})
+        if index not in cache:
+            cls_preds_2d = batch_dict["batch_cls_preds2d"][index]
+            cache[index] = torch.max(cls_preds_2d[:, 1:].contiguous(), dim=-1)
+        return cache[index]
+
+    def _iou_zeros(self, ref, length):
+        """Zero max-IoU vector for the empty-detections fallback.
+
+        Returned as a broadcast view of a cached per-device scalar, so the
+        fallback path allocates nothing after the first hit.
+        """
+        cache = getattr(self, "_iou_zero_cache", None)
+        if cache is None:
+            cache = {}
+            self._iou_zero_cache = cache
+        key = (ref.device, ref.dtype)
+        if key not in cache:
+            cache[key] = torch.zeros(1, device=ref.device, dtype=ref.dtype)
+        return cache[key].expand(length)
+
     def fusion_post_processing0(self, batch_dict):
         """
         Args:
@@ -549,44 +813,72 @@ class FusionRCNN(Detector3DTemplate):
         post_process_cfg = self.model_cfg.POST_PROCESSING
         batch_size = batch_dict["batch_size"]
         recall_dict = {}
-        pred_dicts = []
+        pred_dicts = [None] * batch_size
+
+        # normalize and argmax once over the whole batch; the loop below then
+        # only slices, instead of launching a sigmoid + max kernel per sample
+        batch_cls_preds = batch_dict["batch_cls_preds"]
+        assert not isinstance(batch_cls_preds, list)
+        assert batch_cls_preds.shape[-1] in [1, self.num_class]
+        if not batch_dict["cls_preds_normalized"]:
+            norm_cls_preds = torch.sigmoid(batch_cls_preds)
+        else:
+            norm_cls_preds = batch_cls_preds
+        cls_scores_all, cls_labels_all = torch.max(norm_cls_preds, dim=-1)
+        raw_scores_all = None
+        if post_process_cfg.OUTPUT_RAW_SCORE:
+            raw_scores_all = torch.max(batch_cls_preds, dim=-1).values
+
+        # boxes, fused score and labels ride in one tensor so every sample
+        # pays a single roi_keep2d gather instead of three or four
+        if batch_dict.get("has_class_labels", False):
+            label_key = (
+                "roi_labels" if "roi_labels" in batch_dict else "batch_pred_labels"
+            )
+            label_src = batch_dict[label_key].reshape(cls_scores_all.shape)
+        else:
+            label_src = cls_labels_all + 1
+        combined_cols = [
+            batch_dict["batch_box_preds"],
+            cls_scores_all.unsqueeze(-1),
+            label_src.unsqueeze(-1).float(),
+        ]
+        if raw_scores_all is not None:
+            combined_cols.append(raw_scores_all.unsqueeze(-1))
+        combined_all = torch.cat(combined_cols, dim=-1)
+        box_dim = batch_dict["batch_box_preds"].shape[-1]
+
+        # bind the per-sample sources once; the loop then only indexes locals
+        batch_index = batch_dict.get("batch_index", None)
+        batch_box_preds = batch_dict["batch_box_preds"]
+        cls_preds_2d_all = batch_dict["batch_cls_preds2d"]
+        box_preds_2d_all = batch_dict["batch_box_preds2d"]
+        roi_keep2d_all = batch_dict["batch_roi_keep2d"]
+        image_shapes = batch_dict["image_shape"]
+        image_sizes = batch_dict["images"].image_sizes
+
         for index in range(batch_size):
-            if batch_dict.get("batch_index", None) is not None:
-                assert batch_dict["batch_box_preds"].shape.__len__() == 2
-                batch_mask = batch_dict["batch_index"] == index
+            if batch_index is not None:
+                assert batch_box_preds.shape.__len__() == 2
+                batch_mask = batch_index == index
             else:
-                assert batch_dict["batch_box_preds"].shape.__len__() == 3
+                assert batch_box_preds.shape.__len__() == 3
                 batch_mask = index
 
-            box_preds = batch_dict["batch_box_preds"][batch_mask]
-
-            cls_preds_2d = batch_dict["batch_cls_preds2d"][index]
-            box_preds_2d = batch_dict["batch_box_preds2d"][index]
+            cls_preds_2d = cls_preds_2d_all[index]
+            box_preds_2d = box_preds_2d_all[index]
             # cls_fg_2d = cls_preds_2d[:, 1:].sum(1)
-            image_shape = batch_dict["image_shape"][index]
-            new_shape = batch_dict["images"].image_sizes[index]
-            roi_keep2d = batch_dict["batch_roi_keep2d"][index]
+            image_shape = image_shapes[index]
+            new_shape = image_sizes[index]
+            roi_keep2d = roi_keep2d_all[index]
 
-            box_preds = box_preds[roi_keep2d]
+            combined = combined_all[batch_mask][roi_keep2d]
+            box_preds = combined[:, :box_dim]
             src_box_preds = box_preds
 
-            if not isinstance(batch_dict["batch_cls_preds"], list):
-                cls_preds = batch_dict["batch_cls_preds"][batch_mask]
-                cls_preds = cls_preds[roi_keep2d]
-                src_cls_preds = cls_preds
-                assert cls_preds.shape[1] in [1, self.num_class]
-
-                if not batch_dict["cls_preds_normalized"]:
-                    cls_preds = torch.sigmoid(cls_preds)
-            else:
-                assert False
-                cls_preds = [x[batch_mask] for x in batch_dict["batch_cls_preds"]]
-                src_cls_preds = cls_preds
-                if not batch_dict["cls_preds_normalized"]:
-                    cls_preds = [torch.sigmoid(x) for x in cls_preds]
-
             if post_process_cfg.NMS_CONFIG.MULTI_CLASSES_NMS:
                 assert False
+                cls_preds = norm_cls_preds[batch_mask][roi_keep2d]
                 if not isinstance(cls_preds, list):
                     cls_preds = [cls_preds]
                     multihead_label_mapping = [
@@ -624,23 +916,11 @@ class FusionRCNN(Detector3DTemplate):
                 final_labels = torch.cat(pred_labels, dim=0)
                 final_boxes = torch.cat(pred_boxes, dim=0)
             else:
-                cls_preds, label_preds = torch.max(cls_preds, dim=-1)
-                if batch_dict.get("has_class_labels", False):
-                    label_key = (
-                        "roi_labels"
-                        if "roi_labels" in batch_dict
-                        else "batch_pred_labels"
-                    )
-                    label_preds = batch_dict[label_key][index]
-                    label_preds = label_preds[roi_keep2d]
-                else:
-                    label_preds = label_preds + 1
+                cls_preds = combined[:, box_dim]
+                label_preds = combined[:, box_dim + 1].long()
                 fusion_strategy = self.model_cfg.POST_PROCESSING.get("STRATEGY", 0)
                 if fusion_strategy == 0:
-                    cls_fg_2d = cls_preds_2d[
-                        torch.arange(cls_preds_2d.shape[0]), label_preds
-                    ]
-                    cls_preds = (cls_preds + cls_fg_2d) / 2
+                    cls_preds = _fuse_scores(cls_preds, cls_preds_2d, label_preds)
                 selected, selected_scores = model_nms_utils.class_agnostic_nms(
                     box_scores=cls_preds,
                     box_preds=box_preds,
@@ -649,39 +929,48 @@ class FusionRCNN(Detector3DTemplate):
                 )
 
                 if post_process_cfg.OUTPUT_RAW_SCORE:
-                    max_cls_preds, _ = torch.max(src_cls_preds, dim=-1)
-                    selected_scores = max_cls_preds[selected]
+                    selected_scores = combined[:, box_dim + 2][selected]
 
                 final_scores = selected_scores
                 final_labels = label_preds[selected]
                 final_boxes = box_preds[selected]
 
-                final_labels_2d = final_labels
                 final_boxes_2d = box_preds_2d[selected]
-                final_scores_2d = cls_preds_2d[selected, final_labels_2d]
+                # slice the 2D scores once; the strategy only decides where
+                # the labels come from before the shared gather
+                sel_cls2d = cls_preds_2d.index_select(0, selected)
                 if fusion_strategy >= 0 and selected.size(0) > 0:
-                    final_labels_2d = torch.argmax(cls_preds_2d[selected], 1)
-                    final_scores_2d = cls_preds_2d[selected, final_labels_2d]
-
-                keep = final_labels_2d > 0
-                final_labels_2d = final_labels_2d[keep]
-                final_boxes_2d = final_boxes_2d[keep]
-                final_scores_2d = final_scores_2d[keep]
+                    final_labels_2d = sel_cls2d.argmax(1)
+                else:
+                    final_labels_2d = final_labels
+                final_scores_2d = sel_cls2d.gather(
+                    1, final_labels_2d.unsqueeze(1)
+                ).squeeze(1)
+
+                # one nonzero, then index_select: the three filters share the
+                # index tensor instead of re-deriving it from the mask
+                keep_idx = (final_labels_2d > 0).nonzero(as_tuple=False).squeeze(1)
+                final_labels_2d = final_labels_2d.index_select(0, keep_idx)
+                final_boxes_2d = final_boxes_2d.index_select(0, keep_idx)
+                final_scores_2d = final_scores_2d.index_select(0, keep_idx)
 
                 num_bbox_reg_classes = box_preds_2d.shape[1] // 4
-                final_boxes_2d = final_boxes_2d.reshape(-1, num_bbox_reg_classes, 4)
-                N = final_boxes_2d.shape[0]
-                final_boxes_2d = final_boxes_2d[torch.arange(N), (final_labels_2d - 1)]
+                # class-agnostic box regression: every row would pick column
+                # 0, so skip the view + gather entirely
+                if num_bbox_reg_classes > 1:
+                    final_boxes_2d = final_boxes_2d.view(
+                        -1, num_bbox_reg_classes, 4
+                    )
+                    # gather instead of arange-based fancy indexing: no index
+                    # tensor allocated per sample
+                    final_boxes_2d = final_boxes_2d.gather(
+                        1, (final_labels_2d - 1).view(-1, 1, 1).expand(-1, 1, 4)
+                    ).squeeze(1)
 
-                final_boxes_2d = recover_boxes_2d(
+                final_boxes_2d = _recover_and_clip_2d(
                     final_boxes_2d, image_shape, new_shape
                 )
 
-                # Convert to Boxes to use the `clip` function ...
-                final_boxes_2d = Boxes(final_boxes_2d.reshape(-1, 4))
-                final_boxes_2d.clip(image_shape)
-                final_boxes_2d = final_boxes_2d.tensor.view(-1, 4)  # R x C x 4
-
             recall_dict = self.generate_recall_record(
                 box_preds=final_boxes if "rois" not in batch_dict else src_box_preds,
                 recall_dict=recall_dict,
@@ -694,15 +983,15 @@ class FusionRCNN(Detector3DTemplate):
                 "pred_boxes": final_boxes,
                 "pred_scores": final_scores,
                 "pred_labels": final_labels,
-                "pred_boxes2d": final_boxes_2d.cpu().numpy(),
-                "pred_scores2d": final_scores_2d.cpu().numpy(),
-                "pred_labels2d": final_labels_2d.cpu().numpy()
+                "pred_boxes2d": _stage_to_cpu(final_boxes_2d),
+                "pred_scores2d": _stage_to_cpu(final_scores_2d),
+                "pred_labels2d": _stage_to_cpu(final_labels_2d)
                 # todo weather use 3d pred labels?
             }
             assert len(final_boxes) >= len(final_boxes_2d)
-            pred_dicts.append(record_dict)
+            pred_dicts[index] = record_dict
 
-        return pred_dicts, recall_dict
+        return _finalize_pred_dicts(pred_dicts), recall_dict
 
     def fusion_post_processing1(self, batch_dict):
         """
@@ -724,23 +1013,31 @@ class FusionRCNN(Detector3DTemplate):
         post_process_cfg = self.model_cfg.POST_PROCESSING
         batch_size = batch_dict["batch_size"]
         recall_dict = {}
-        pred_dicts = []
+        pred_dicts = [None] * batch_size
+        # bind the per-sample sources once; the loop then only indexes locals
+        batch_index = batch_dict.get("batch_index", None)
+        batch_box_preds = batch_dict["batch_box_preds"]
+        cls_preds_2d_all = batch_dict["batch_cls_preds2d"]
+        box_preds_2d_all = batch_dict["batch_box_preds2d"]
+        roi_keep2d_all = batch_dict["batch_roi_keep2d"]
+        image_shapes = batch_dict["image_shape"]
+        image_sizes = batch_dict["images"].image_sizes
         for index in range(batch_size):
-            if batch_dict.get("batch_index", None) is not None:
-                assert batch_dict["batch_box_preds"].shape.__len__() == 2
-                batch_mask = batch_dict["batch_index"] == index
+            if batch_index is not None:
+                assert batch_box_preds.shape.__len__() == 2
+                batch_mask = batch_index == index
             else:
-                assert batch_dict["batch_box_preds"].shape.__len__() == 3
+                assert batch_box_preds.shape.__len__() == 3
                 batch_mask = index
 
-            box_preds = batch_dict["batch_box_preds"][batch_mask]
+            box_preds = batch_box_preds[batch_mask]
 
-            cls_preds_2d = batch_dict["batch_cls_preds2d"][index]
-            box_preds_2d = batch_dict["batch_box_preds2d"][index]
+            cls_preds_2d = cls_preds_2d_all[index]
+            box_preds_2d = box_preds_2d_all[index]
             cls_fg_2d = torch.argmax(cls_preds_2d, 1)
-            image_shape = batch_dict["image_shape"][index]
-            new_shape = batch_dict["images"].image_sizes[index]
-            roi_keep2d = batch_dict["batch_roi_keep2d"][index]
+            image_shape = image_shapes[index]
+            new_shape = image_sizes[index]
+            roi_keep2d = roi_keep2d_all[index]
 
             box_preds = box_preds[roi_keep2d]
             src_box_preds = box_preds
@@ -750,8 +1047,7 @@ class FusionRCNN(Detector3DTemplate):
                 # cls_preds = cls_preds[roi_keep2d]
                 # src_cls_preds = cls_preds
                 src_cls_preds = cls_preds_2d
-                cls_preds, label_preds = torch.max(cls_preds_2d[:, 1:], dim=-1)
-                label_preds += 1
+                cls_preds, label_preds = self._cls2d_max(batch_dict, index)
                 # assert cls_preds.shape[1] in [1, self.num_class]
                 #
                 # if not batch_dict['cls_preds_normalized']:
@@ -822,11 +1118,15 @@ class FusionRCNN(Detector3DTemplate):
                 )
 
                 if post_process_cfg.OUTPUT_RAW_SCORE:
-                    max_cls_preds, _ = torch.max(src_cls_preds, dim=-1)
+                    # cls_preds already holds the max over the foreground
+                    # columns, so the full-row max only needs an elementwise
+                    # comparison against the background column
+                    max_cls_preds = torch.maximum(cls_preds, src_cls_preds[:, 0])
                     selected_scores = max_cls_preds[selected]
 
                 final_scores = selected_scores
-                final_labels = label_preds[selected]
+                # _cls2d_max labels are 0-based; shift the selected subset
+                final_labels = label_preds[selected] + 1
                 final_boxes = box_preds[selected]
 
                 final_labels_2d = final_labels
@@ -842,19 +1142,22 @@ class FusionRCNN(Detector3DTemplate):
                 # final_scores_2d = final_scores_2d[keep]
 
                 num_bbox_reg_classes = box_preds_2d.shape[1] // 4
-                final_boxes_2d = final_boxes_2d.reshape(-1, num_bbox_reg_classes, 4)
-                N = final_boxes_2d.shape[0]
-                final_boxes_2d = final_boxes_2d[torch.arange(N), (final_labels_2d - 1)]
+                # class-agnostic box regression: every row would pick column
+                # 0, so skip the view + gather entirely
+                if num_bbox_reg_classes > 1:
+                    final_boxes_2d = final_boxes_2d.view(
+                        -1, num_bbox_reg_classes, 4
+                    )
+                    # gather instead of arange-based fancy indexing: no index
+                    # tensor allocated per sample
+                    final_boxes_2d = final_boxes_2d.gather(
+                        1, (final_labels_2d - 1).view(-1, 1, 1).expand(-1, 1, 4)
+                    ).squeeze(1)
 
-                final_boxes_2d = recover_boxes_2d(
+                final_boxes_2d = _recover_and_clip_2d(
                     final_boxes_2d, image_shape, new_shape
                 )
 
-                # Convert to Boxes to use the `clip` function ...
-                final_boxes_2d = Boxes(final_boxes_2d.reshape(-1, 4))
-                final_boxes_2d.clip(image_shape)
-                final_boxes_2d = final_boxes_2d.tensor.view(-1, 4)  # R x C x 4
-
             recall_dict = self.generate_recall_record(
                 box_preds=final_boxes if "rois" not in batch_dict else src_box_preds,
                 recall_dict=recall_dict,
@@ -867,15 +1170,15 @@ class FusionRCNN(Detector3DTemplate):
                 "pred_boxes": final_boxes,
                 "pred_scores": final_scores,
                 "pred_labels": final_labels,
-                "pred_boxes2d": final_boxes_2d.cpu().numpy(),
-                "pred_scores2d": final_scores_2d.cpu().numpy(),
-                "pred_labels2d": final_labels_2d.cpu().numpy()
+                "pred_boxes2d": _stage_to_cpu(final_boxes_2d),
+                "pred_scores2d": _stage_to_cpu(final_scores_2d),
+                "pred_labels2d": _stage_to_cpu(final_labels_2d)
                 # todo weather use 3d pred labels?
             }
             assert len(final_boxes) >= len(final_boxes_2d)
-            pred_dicts.append(record_dict)
+            pred_dicts[index] = record_dict
 
-        return pred_dicts, recall_dict
+        return _finalize_pred_dicts(pred_dicts), recall_dict
 
     def fusion_post_processing2(self, batch_dict):
         """
@@ -897,32 +1200,40 @@ class FusionRCNN(Detector3DTemplate):
         post_process_cfg = self.model_cfg.POST_PROCESSING
         batch_size = batch_dict["batch_size"]
         recall_dict = {}
-        pred_dicts = []
+        pred_dicts = [None] * batch_size
+        # bind the per-sample sources once; the loop then only indexes locals
+        batch_index = batch_dict.get("batch_index", None)
+        batch_box_preds = batch_dict["batch_box_preds"]
+        cls_preds_2d_all = batch_dict["batch_cls_preds2d"]
+        box_preds_2d_all = batch_dict["batch_box_preds2d"]
+        box_keep2d_all = batch_dict["batch_box_keep2d"]
+        roi_keep2d_all = batch_dict["batch_roi_keep2d"]
+        image_shapes = batch_dict["image_shape"]
+        image_sizes = batch_dict["images"].image_sizes
         for index in range(batch_size):
-            if batch_dict.get("batch_index", None) is not None:
-                assert batch_dict["batch_box_preds"].shape.__len__() == 2
-                batch_mask = batch_dict["batch_index"] == index
+            if batch_index is not None:
+                assert batch_box_preds.shape.__len__() == 2
+                batch_mask = batch_index == index
             else:
-                assert batch_dict["batch_box_preds"].shape.__len__() == 3
+                assert batch_box_preds.shape.__len__() == 3
                 batch_mask = index
 
-            box_preds = batch_dict["batch_box_preds"][batch_mask]
+            box_preds = batch_box_preds[batch_mask]
 
-            cls_preds_2d = batch_dict["batch_cls_preds2d"][index]
-            box_preds_2d = batch_dict["batch_box_preds2d"][index]
+            cls_preds_2d = cls_preds_2d_all[index]
+            box_preds_2d = box_preds_2d_all[index]
 
-            box_keep2d = batch_dict["batch_box_keep2d"][index]
-            cls_fg_2d, label_preds_2d = torch.max(cls_preds_2d[:, 1:], 1)
-            label_preds_2d += 1
-            image_shape = batch_dict["image_shape"][index]
-            new_shape = batch_dict["images"].image_sizes[index]
-            roi_keep2d = batch_dict["batch_roi_keep2d"][index]
+            box_keep2d = box_keep2d_all[index]
+            cls_fg_2d, label_preds_2d = self._cls2d_max(batch_dict, index)
+            image_shape = image_shapes[index]
+            new_shape = image_sizes[index]
+            roi_keep2d = roi_keep2d_all[index]
 
             box_preds = box_preds[roi_keep2d]
             src_box_preds = box_preds
 
             num_bbox_reg_classes = box_preds_2d.shape[1] // 4
-            box_preds_2d = box_preds_2d.reshape(-1, num_bbox_reg_classes, 4)
+            box_preds_2d = box_preds_2d.view(-1, num_bbox_reg_classes, 4)
 
             if not isinstance(batch_dict["batch_cls_preds"], list):
                 cls_preds = batch_dict["batch_cls_preds"][batch_mask]
@@ -997,154 +1308,49 @@ class FusionRCNN(Detector3DTemplate):
                     score_thresh=post_process_cfg.SCORE_THRESH,
                 )
 
-                # ***********************************************************
-                select_from_3d = set(selected.cpu().numpy())
-                select_from_2d = set(box_keep2d.cpu().numpy())
-                joint_selected2 = torch.tensor(
-                    list(select_from_3d | select_from_2d),
-                    dtype=torch.long,
-                    device=selected.device,
-                )
-                joint_selected2, _ = torch.sort(joint_selected2)
-                # ***********************************************************
-
-                select_from_3d = np.sort(selected.cpu().numpy())
-                select_from_2d = np.sort(box_keep2d.cpu().numpy())
-                joint_selected = []
-                final_scores_3d = []
-                final_scores_2d = []
-                final_labels_3d = []
-                final_labels_2d = []
-                final_boxes_2d = []
-                final_boxes_3d = []
-                _i = _j = 0
-                only_in_3d = 0
-                only_in_2d = 0
-                both = 0
-                while _i < len(select_from_3d) or _j < len(select_from_2d):
-                    if _i >= len(select_from_3d) or _j >= len(select_from_2d):
-                        while _i >= len(select_from_3d) and _j < len(select_from_2d):
-                            joint_selected.append(select_from_2d[_j])
-                            idx2d = select_from_2d[_j]
-                            final_scores_2d.append(cls_fg_2d[idx2d])
-                            final_labels_2d.append(label_preds_2d[idx2d])
-                            final_boxes_2d.append(
-                                box_preds_2d[idx2d, final_labels_2d[-1] - 1]
-                            )
-                            final_scores_3d.append(cls_fg_2d[idx2d])
-                            final_labels_3d.append(label_preds_2d[idx2d])
-                            final_boxes_3d.append(box_preds[idx2d])
-
-                            _j += 1
-                            only_in_2d += 1
-                        while _j >= len(select_from_2d) and _i < len(select_from_3d):
-                            joint_selected.append(select_from_3d[_i])
-                            idx3d = select_from_3d[_i]
-                            final_scores_2d.append(cls_preds[idx3d])
-                            final_labels_2d.append(label_preds[idx3d])
-                            final_boxes_2d.append(
-                                box_preds_2d[idx3d, final_labels_2d[-1] - 1]
-                            )  # TODO use project 3d box?
-                            final_scores_3d.append(cls_preds[idx3d])
-                            final_labels_3d.append(label_preds[idx3d])
-                            final_boxes_3d.append(box_preds[idx3d])
-
-                            _i += 1
-                            only_in_3d += 1
-                        break
-                    if select_from_3d[_i] == select_from_2d[_j]:
-                        idx3d = select_from_3d[_i]
-                        joint_selected.append(idx3d)
-                        final_scores_2d.append(cls_fg_2d[idx3d])
-                        final_labels_2d.append(label_preds_2d[idx3d])
-                        final_boxes_2d.append(
-                            box_preds_2d[idx3d, final_labels_2d[-1] - 1]
-                        )
-                        final_scores_3d.append(cls_preds[idx3d])
-                        final_labels_3d.append(label_preds[idx3d])
-                        final_boxes_3d.append(box_preds[idx3d])
-                        _i += 1
-                        _j += 1
-                        both += 1
-                    elif select_from_3d[_i] < select_from_2d[_j]:
-                        joint_selected.append(select_from_3d[_i])
-                        idx3d = select_from_3d[_i]
-                        final_scores_2d.append(cls_preds[idx3d])
-                        final_labels_2d.append(label_preds[idx3d])
-                        final_boxes_2d.append(
-                            box_preds_2d[idx3d, final_labels_2d[-1] - 1]
-                        )  # TODO use project 3d box?
-                        final_scores_3d.append(cls_preds[idx3d])
-                        final_labels_3d.append(label_preds[idx3d])
-                        final_boxes_3d.append(box_preds[idx3d])
-
-                        _i += 1
-                        only_in_3d += 1
-                    else:
-                        joint_selected.append(select_from_2d[_j])
-                        idx2d = select_from_2d[_j]
-                        final_scores_2d.append(cls_fg_2d[idx2d])
-                        final_labels_2d.append(label_preds_2d[idx2d])
-                        final_boxes_2d.append(
-                            box_preds_2d[idx2d, final_labels_2d[-1] - 1]
+                (
+                    joint_selected,
+                    in_3d,
+                    in_2d,
+                    only_in_3d,
+                    only_in_2d,
+                    both,
+                ) = _union_selections(selected, box_keep2d, box_preds.shape[0])
+
+                # each branch keeps its own prediction where it selected the
+                # roi and falls back to the other branch elsewhere
+                sel_scores_3d = cls_preds[joint_selected]
+                sel_labels_3d = label_preds[joint_selected]
+                sel_scores_2d = cls_fg_2d[joint_selected]
+                # _cls2d_max labels are 0-based; shift on the union subset
+                sel_labels_2d = label_preds_2d[joint_selected] + 1
+
+                final_scores_2d = torch.where(in_2d, sel_scores_2d, sel_scores_3d)
+                final_labels_2d = torch.where(in_2d, sel_labels_2d, sel_labels_3d)
+                final_scores = torch.where(in_3d, sel_scores_3d, sel_scores_2d)
+                final_labels = torch.where(in_3d, sel_labels_3d, sel_labels_2d)
+                final_boxes = box_preds[joint_selected]
+                if num_bbox_reg_classes == 1:
+                    # class-agnostic box regression: nothing to gather
+                    final_boxes_2d = box_preds_2d[joint_selected].squeeze(1)
+                else:
+                    final_boxes_2d = (
+                        box_preds_2d[joint_selected]
+                        .gather(
+                            1,
+                            (final_labels_2d - 1).view(-1, 1, 1).expand(-1, 1, 4),
                         )
-                        final_scores_3d.append(cls_fg_2d[idx2d])
-                        final_labels_3d.append(label_preds_2d[idx2d])
-                        final_boxes_3d.append(box_preds[idx2d])
-
-                        _j += 1
-                        only_in_2d += 1
-
-                joint_selected = torch.tensor(
-                    joint_selected, dtype=torch.long, device=selected.device
-                )
-                joint_selected, _ = torch.sort(joint_selected)
-                assert torch.allclose(joint_selected2, joint_selected)
+                        .squeeze(1)
+                    )  # TODO use project 3d box?
 
                 # if post_process_cfg.OUTPUT_RAW_SCORE:
                 #     max_cls_preds, _ = torch.max(src_cls_preds, dim=-1)
                 #     selected_scores = max_cls_preds[selected]
-                device = cls_preds.device
-                final_scores = torch.tensor(final_scores_3d, device=device)
-                final_labels = torch.tensor(final_labels_3d, device=device)
-                final_boxes = (
-                    torch.cat([x.view(1, -1) for x in final_boxes_3d], dim=0)
-                    if len(final_boxes_3d) > 0
-                    else torch.tensor([], device=device).view(0, 7)
-                )
-
-                final_labels_2d = torch.tensor(final_labels_2d, device=device)
-                final_boxes_2d = (
-                    torch.cat([x.view(1, -1) for x in final_boxes_2d], dim=0)
-                    if len(final_boxes_2d) > 0
-                    else torch.tensor([], device=device).view(0, 4)
-                )
-                final_scores_2d = torch.tensor(final_scores_2d, device=device)
-                # if selected.size(0) > 0:
-                #     final_labels_2d = torch.argmax(cls_preds_2d[selected], 1)
-                #     final_scores_2d = cls_preds_2d[selected, final_labels_2d]
-                # #
-                # keep = final_labels_2d > 0
-                # final_labels_2d = final_labels_2d[keep]
-                # final_boxes_2d = final_boxes_2d[keep]
-                # final_scores_2d = final_scores_2d[keep]
                 if len(final_boxes_2d) > 0:
-                    # num_bbox_reg_classes = box_preds_2d.shape[1] // 4
-                    # final_boxes_2d = final_boxes_2d.reshape(-1,
-                    #                                         num_bbox_reg_classes, 4)
-                    # N = final_boxes_2d.shape[0]
-                    # final_boxes_2d = final_boxes_2d[
-                    #     torch.arange(N), (final_labels_2d - 1)]
-                    #
-                    final_boxes_2d = recover_boxes_2d(
+                    final_boxes_2d = _recover_and_clip_2d(
                         final_boxes_2d, image_shape, new_shape
                     )
 
-                    # Convert to Boxes to use the `clip` function ...
-                    final_boxes_2d = Boxes(final_boxes_2d.reshape(-1, 4))
-                    final_boxes_2d.clip(image_shape)
-                    final_boxes_2d = final_boxes_2d.tensor.view(-1, 4)  # R x C x 4
-
             recall_dict = self.generate_recall_record(
                 box_preds=final_boxes if "rois" not in batch_dict else src_box_preds,
                 recall_dict=recall_dict,
@@ -1157,17 +1363,17 @@ class FusionRCNN(Detector3DTemplate):
                 "pred_boxes": final_boxes,
                 "pred_scores": final_scores,
                 "pred_labels": final_labels,
-                "pred_boxes2d": final_boxes_2d.cpu().numpy(),
-                "pred_scores2d": final_scores_2d.cpu().numpy(),
-                "pred_labels2d": final_labels_2d.cpu().numpy(),
+                "pred_boxes2d": _stage_to_cpu(final_boxes_2d),
+                "pred_scores2d": _stage_to_cpu(final_scores_2d),
+                "pred_labels2d": _stage_to_cpu(final_labels_2d),
                 "only_in_2d": only_in_2d,
                 "only_in_3d": only_in_3d,
                 "both": both,
             }
             assert len(final_boxes) >= len(final_boxes_2d)
-            pred_dicts.append(record_dict)
+            pred_dicts[index] = record_dict
 
-        return pred_dicts, recall_dict
+        return _finalize_pred_dicts(pred_dicts), recall_dict
 
     def fusion_post_processing3(self, batch_dict):
         """
@@ -1189,32 +1395,40 @@ class FusionRCNN(Detector3DTemplate):
         post_process_cfg = self.model_cfg.POST_PROCESSING
         batch_size = batch_dict["batch_size"]
         recall_dict = {}
-        pred_dicts = []
+        pred_dicts = [None] * batch_size
+        # bind the per-sample sources once; the loop then only indexes locals
+        batch_index = batch_dict.get("batch_index", None)
+        batch_box_preds = batch_dict["batch_box_preds"]
+        cls_preds_2d_all = batch_dict["batch_cls_preds2d"]
+        box_preds_2d_all = batch_dict["batch_box_preds2d"]
+        box_keep2d_all = batch_dict["batch_box_keep2d"]
+        roi_keep2d_all = batch_dict["batch_roi_keep2d"]
+        image_shapes = batch_dict["image_shape"]
+        image_sizes = batch_dict["images"].image_sizes
         for index in range(batch_size):
-            if batch_dict.get("batch_index", None) is not None:
-                assert batch_dict["batch_box_preds"].shape.__len__() == 2
-                batch_mask = batch_dict["batch_index"] == index
+            if batch_index is not None:
+                assert batch_box_preds.shape.__len__() == 2
+                batch_mask = batch_index == index
             else:
-                assert batch_dict["batch_box_preds"].shape.__len__() == 3
+                assert batch_box_preds.shape.__len__() == 3
                 batch_mask = index
 
-            box_preds = batch_dict["batch_box_preds"][batch_mask]
+            box_preds = batch_box_preds[batch_mask]
 
-            cls_preds_2d = batch_dict["batch_cls_preds2d"][index]
-            box_preds_2d = batch_dict["batch_box_preds2d"][index]
+            cls_preds_2d = cls_preds_2d_all[index]
+            box_preds_2d = box_preds_2d_all[index]
 
-            box_keep2d = batch_dict["batch_box_keep2d"][index]
-            cls_fg_2d, label_preds_2d = torch.max(cls_preds_2d[:, 1:], 1)
-            label_preds_2d += 1
-            image_shape = batch_dict["image_shape"][index]
-            new_shape = batch_dict["images"].image_sizes[index]
-            roi_keep2d = batch_dict["batch_roi_keep2d"][index]
+            box_keep2d = box_keep2d_all[index]
+            cls_fg_2d, label_preds_2d = self._cls2d_max(batch_dict, index)
+            image_shape = image_shapes[index]
+            new_shape = image_sizes[index]
+            roi_keep2d = roi_keep2d_all[index]
 
             box_preds = box_preds[roi_keep2d]
             src_box_preds = box_preds
 
             num_bbox_reg_classes = box_preds_2d.shape[1] // 4
-            box_preds_2d = box_preds_2d.reshape(-1, num_bbox_reg_classes, 4)
+            box_preds_2d = box_preds_2d.view(-1, num_bbox_reg_classes, 4)
 
             if not isinstance(batch_dict["batch_cls_preds"], list):
                 cls_preds = batch_dict["batch_cls_preds"][batch_mask]
@@ -1289,140 +1503,51 @@ class FusionRCNN(Detector3DTemplate):
                     score_thresh=post_process_cfg.SCORE_THRESH,
                 )
 
-                # ***********************************************************
-                select_from_3d = set(selected.cpu().numpy())
-                select_from_2d = set(box_keep2d.cpu().numpy())
-                joint_selected2 = torch.tensor(
-                    list(select_from_3d | select_from_2d),
-                    dtype=torch.long,
-                    device=selected.device,
+                (
+                    joint_selected,
+                    in_3d,
+                    in_2d,
+                    only_in_3d,
+                    only_in_2d,
+                    both,
+                ) = _union_selections(selected, box_keep2d, box_preds.shape[0])
+
+                # 3D outputs cover the whole union with the image branch
+                # filling in rois the 3D NMS dropped; 2D outputs only exist
+                # for rois the image branch itself kept
+                final_scores = torch.where(
+                    in_3d, cls_preds[joint_selected], cls_fg_2d[joint_selected]
                 )
-                joint_selected2, _ = torch.sort(joint_selected2)
-                # ***********************************************************
-
-                select_from_3d = np.sort(selected.cpu().numpy())
-                select_from_2d = np.sort(box_keep2d.cpu().numpy())
-                joint_selected = []
-                final_scores_3d = []
-                final_scores_2d = []
-                final_labels_3d = []
-                final_labels_2d = []
-                final_boxes_2d = []
-                final_boxes_3d = []
-                _i = _j = 0
-                only_in_3d = 0
-                only_in_2d = 0
-                both = 0
-                while _i < len(select_from_3d) or _j < len(select_from_2d):
-                    if _i >= len(select_from_3d) or _j >= len(select_from_2d):
-                        while _i >= len(select_from_3d) and _j < len(select_from_2d):
-                            joint_selected.append(select_from_2d[_j])
-                            idx2d = select_from_2d[_j]
-                            final_scores_2d.append(cls_fg_2d[idx2d])
-                            final_labels_2d.append(label_preds_2d[idx2d])
-                            final_boxes_2d.append(
-                                box_preds_2d[idx2d, final_labels_2d[-1] - 1]
-                            )
-                            final_scores_3d.append(cls_fg_2d[idx2d])
-                            final_labels_3d.append(label_preds_2d[idx2d])
-                            final_boxes_3d.append(box_preds[idx2d])
-
-                            _j += 1
-                            only_in_2d += 1
-                        while _j >= len(select_from_2d) and _i < len(select_from_3d):
-                            joint_selected.append(select_from_3d[_i])
-                            idx3d = select_from_3d[_i]
-                            # final_scores_2d.append(cls_preds[idx3d])
-                            # final_labels_2d.append(label_preds[idx3d])
-                            # final_boxes_2d.append(
-                            #     box_preds_2d[idx3d, final_labels_2d[
-                            #         -1] - 1])  # TODO use project 3d box?
-                            final_scores_3d.append(cls_preds[idx3d])
-                            final_labels_3d.append(label_preds[idx3d])
-                            final_boxes_3d.append(box_preds[idx3d])
-
-                            _i += 1
-                            only_in_3d += 1
-                        break
-
-                    if select_from_3d[_i] == select_from_2d[_j]:
-                        idx3d = select_from_3d[_i]
-                        joint_selected.append(idx3d)
-                        final_scores_2d.append(cls_fg_2d[idx3d])
-                        final_labels_2d.append(label_preds_2d[idx3d])
-                        final_boxes_2d.append(
-                            box_preds_2d[idx3d, final_labels_2d[-1] - 1]
-                        )
-                        final_scores_3d.append(cls_preds[idx3d])
-                        final_labels_3d.append(label_preds[idx3d])
-                        final_boxes_3d.append(box_preds[idx3d])
-                        _i += 1
-                        _j += 1
-                        both += 1
-                    elif select_from_3d[_i] < select_from_2d[_j]:
-                        joint_selected.append(select_from_3d[_i])
-                        idx3d = select_from_3d[_i]
-                        # final_scores_2d.append(cls_preds[idx3d])
-                        # final_labels_2d.append(label_preds[idx3d])
-                        # final_boxes_2d.append(
-                        #     box_preds_2d[idx3d, final_labels_2d[-1] - 1]) # TODO use project 3d box?
-                        final_scores_3d.append(cls_preds[idx3d])
-                        final_labels_3d.append(label_preds[idx3d])
-                        final_boxes_3d.append(box_preds[idx3d])
-
-                        _i += 1
-                        only_in_3d += 1
-                    else:
-                        joint_selected.append(select_from_2d[_j])
-                        idx2d = select_from_2d[_j]
-                        final_scores_2d.append(cls_fg_2d[idx2d])
-                        final_labels_2d.append(label_preds_2d[idx2d])
-                        final_boxes_2d.append(
-                            box_preds_2d[idx2d, final_labels_2d[-1] - 1]
-                        )
-                        final_scores_3d.append(cls_fg_2d[idx2d])
-                        final_labels_3d.append(label_preds_2d[idx2d])
-                        final_boxes_3d.append(box_preds[idx2d])
-
-                        _j += 1
-                        only_in_2d += 1
-
-                joint_selected = torch.tensor(
-                    joint_selected, dtype=torch.long, device=selected.device
+                # _cls2d_max labels are 0-based; shift on the union subsets
+                final_labels = torch.where(
+                    in_3d,
+                    label_preds[joint_selected],
+                    label_preds_2d[joint_selected] + 1,
                 )
-                joint_selected, _ = torch.sort(joint_selected)
-                assert torch.allclose(joint_selected2, joint_selected)
+                final_boxes = box_preds[joint_selected]
+
+                selected_2d = joint_selected[in_2d]
+                final_scores_2d = cls_fg_2d[selected_2d]
+                raw_labels_2d = label_preds_2d[selected_2d]
+                final_labels_2d = raw_labels_2d + 1
+                if num_bbox_reg_classes == 1:
+                    # class-agnostic box regression: nothing to gather
+                    final_boxes_2d = box_preds_2d[selected_2d].squeeze(1)
+                else:
+                    final_boxes_2d = (
+                        box_preds_2d[selected_2d]
+                        .gather(1, raw_labels_2d.view(-1, 1, 1).expand(-1, 1, 4))
+                        .squeeze(1)
+                    )
 
                 # if post_process_cfg.OUTPUT_RAW_SCORE:
                 #     max_cls_preds, _ = torch.max(src_cls_preds, dim=-1)
                 #     selected_scores = max_cls_preds[selected]
-                device = cls_preds.device
-                final_scores = torch.tensor(final_scores_3d, device=device)
-                final_labels = torch.tensor(final_labels_3d, device=device)
-                final_boxes = (
-                    torch.cat([x.view(1, -1) for x in final_boxes_3d], dim=0)
-                    if len(final_boxes_3d) > 0
-                    else torch.tensor([], device=device).view(0, 7)
-                )
-
-                final_labels_2d = torch.tensor(final_labels_2d, device=device)
-                final_boxes_2d = (
-                    torch.cat([x.view(1, -1) for x in final_boxes_2d], dim=0)
-                    if len(final_boxes_2d) > 0
-                    else torch.tensor([], device=device).view(0, 4)
-                )
-                final_scores_2d = torch.tensor(final_scores_2d, device=device)
-
                 if len(final_boxes_2d) > 0:
-                    final_boxes_2d = recover_boxes_2d(
+                    final_boxes_2d = _recover_and_clip_2d(
                         final_boxes_2d, image_shape, new_shape
                     )
 
-                    # Convert to Boxes to use the `clip` function ...
-                    final_boxes_2d = Boxes(final_boxes_2d.reshape(-1, 4))
-                    final_boxes_2d.clip(image_shape)
-                    final_boxes_2d = final_boxes_2d.tensor.view(-1, 4)  # R x C x 4
-
             recall_dict = self.generate_recall_record(
                 box_preds=final_boxes if "rois" not in batch_dict else src_box_preds,
                 recall_dict=recall_dict,
@@ -1435,17 +1560,17 @@ class FusionRCNN(Detector3DTemplate):
                 "pred_boxes": final_boxes,
                 "pred_scores": final_scores,
                 "pred_labels": final_labels,
-                "pred_boxes2d": final_boxes_2d.cpu().numpy(),
-                "pred_scores2d": final_scores_2d.cpu().numpy(),
-                "pred_labels2d": final_labels_2d.cpu().numpy(),
+                "pred_boxes2d": _stage_to_cpu(final_boxes_2d),
+                "pred_scores2d": _stage_to_cpu(final_scores_2d),
+                "pred_labels2d": _stage_to_cpu(final_labels_2d),
                 "only_in_2d": only_in_2d,
                 "only_in_3d": only_in_3d,
                 "both": both,
             }
             assert len(final_boxes) >= len(final_boxes_2d)
-            pred_dicts.append(record_dict)
+            pred_dicts[index] = record_dict
 
-        return pred_dicts, recall_dict
+        return _finalize_pred_dicts(pred_dicts), recall_dict
 
     def fusion_post_processing4(self, batch_dict):
         """
@@ -1483,8 +1608,10 @@ class FusionRCNN(Detector3DTemplate):
             box_preds_2d = batch_dict["batch_box_preds2d"][index]
 
             box_keep2d = batch_dict["batch_box_keep2d"][index]
-            cls_fg_2d, label_preds_2d = torch.max(cls_preds_2d[:, 1:], 1)
-            label_preds_2d += 1
+            # keep the raw 0-based argmax for box gathers; labels are its
+            # 1-based shift
+            cls_fg_2d, label_idx_2d = torch.max(cls_preds_2d[:, 1:], 1)
+            label_preds_2d = label_idx_2d + 1
             image_shape = batch_dict["image_shape"][index]
             new_shape = batch_dict["images"].image_sizes[index]
             roi_keep2d = batch_dict["batch_roi_keep2d"][index]
@@ -1493,7 +1620,7 @@ class FusionRCNN(Detector3DTemplate):
             src_box_preds = box_preds
 
             num_bbox_reg_classes = box_preds_2d.shape[1] // 4
-            box_preds_2d = box_preds_2d.reshape(-1, num_bbox_reg_classes, 4)
+            box_preds_2d = box_preds_2d.view(-1, num_bbox_reg_classes, 4)
 
             if not isinstance(batch_dict["batch_cls_preds"], list):
                 cls_preds = batch_dict["batch_cls_preds"][batch_mask]
@@ -1570,143 +1697,81 @@ class FusionRCNN(Detector3DTemplate):
 
                 select_from_3d, _ = torch.sort(selected)
                 select_from_2d, _ = torch.sort(box_keep2d)
-                joint_selected = []
-                final_scores_3d = []
-                final_scores_2d = []
-                final_labels_3d = []
-                final_labels_2d = []
-                final_boxes_2d = []
-                final_boxes_3d = []
-                _i = _j = 0
-                only_in_3d = 0
-                only_in_2d = 0
-                both = 0
-                only3d_ious = []
-                only2d_ious = []
-                both_ious = []
                 select_box2d = box_preds_2d[
-                    select_from_2d, (label_preds_2d[select_from_2d] - 1)
+                    select_from_2d, label_idx_2d[select_from_2d]
                 ].double()
                 select_box3d = box_preds[select_from_3d]
                 select_box3d, _ = lidar_box_to_image_box(select_box3d, calib)
                 iou_matrix = boxes_iou_normal(select_box2d, select_box3d)
-                if iou_matrix.size(0) == 0 or iou_matrix.size(1) == 0:
-                    iou_matrix = torch.zeros(
-                        (max(1, iou_matrix.size(0)), max(1, iou_matrix.size(1))),
-                        device=iou_matrix.device,
+                if iou_matrix.numel() > 0:
+                    max_iou_2d = iou_matrix.max(dim=1).values
+                    max_iou_3d = iou_matrix.max(dim=0).values
+                else:
+                    # one side is empty: the other side matches nothing
+                    max_iou_2d = self._iou_zeros(iou_matrix, select_from_2d.shape[0])
+                    max_iou_3d = self._iou_zeros(iou_matrix, select_from_3d.shape[0])
+
+                # union of the two keep sets, vectorized as in strategies 2/3;
+                # the full-range membership masks double as rank lookups into
+                # the sorted per-branch lists for the IoU diagnostics
+                num_rois = box_preds.shape[0]
+                in_3d_full = torch.zeros(
+                    num_rois, dtype=torch.bool, device=selected.device
+                )
+                in_3d_full[select_from_3d] = True
+                in_2d_full = torch.zeros_like(in_3d_full)
+                in_2d_full[select_from_2d] = True
+                joint_selected = (
+                    (in_3d_full | in_2d_full).nonzero(as_tuple=False).squeeze(1)
+                )
+                in_3d = in_3d_full[joint_selected]
+                in_2d = in_2d_full[joint_selected]
+                only_in_3d = int((in_3d & ~in_2d).sum())
+                only_in_2d = int((in_2d & ~in_3d).sum())
+                both = int((in_3d & in_2d).sum())
+
+                # each branch keeps its own prediction where it selected the
+                # roi and falls back to the other branch elsewhere
+                sel_scores_3d = cls_preds[joint_selected]
+                sel_labels_3d = label_preds[joint_selected]
+                sel_scores_2d = cls_fg_2d[joint_selected]
+                sel_labels_2d = label_preds_2d[joint_selected]
+
+                final_scores_2d = torch.where(in_2d, sel_scores_2d, sel_scores_3d)
+                final_labels_2d = torch.where(in_2d, sel_labels_2d, sel_labels_3d)
+                final_scores = torch.where(in_3d, sel_scores_3d, sel_scores_2d)
+                final_labels = torch.where(in_3d, sel_labels_3d, sel_labels_2d)
+                final_boxes = box_preds[joint_selected]
+                if num_bbox_reg_classes == 1:
+                    final_boxes_2d = box_preds_2d[joint_selected].squeeze(1)
+                else:
+                    final_boxes_2d = (
+                        box_preds_2d[joint_selected]
+                        .gather(
+                            1,
+                            (final_labels_2d - 1).view(-1, 1, 1).expand(-1, 1, 4),
+                        )
+                        .squeeze(1)
                     )
-                max_iou_2d, mathced_idx_2d = torch.max(iou_matrix, dim=1)
-                max_iou_3d, matched_idx_3d = torch.max(iou_matrix, dim=0)
-                while _i < len(select_from_3d) or _j < len(select_from_2d):
-                    if _i >= len(select_from_3d) or _j >= len(select_from_2d):
-                        while _i >= len(select_from_3d) and _j < len(select_from_2d):
-                            joint_selected.append(select_from_2d[_j])
-                            idx2d = select_from_2d[_j]
-                            final_scores_2d.append(cls_fg_2d[idx2d])
-                            final_labels_2d.append(label_preds_2d[idx2d])
-                            final_boxes_2d.append(
-                                box_preds_2d[idx2d, final_labels_2d[-1] - 1]
-                            )
-                            final_scores_3d.append(cls_fg_2d[idx2d])
-                            final_labels_3d.append(label_preds_2d[idx2d])
-                            final_boxes_3d.append(box_preds[idx2d])
-
-                            only2d_ious.append(max_iou_2d[_j].item())
-                            _j += 1
-                            only_in_2d += 1
-
-                        while _j >= len(select_from_2d) and _i < len(select_from_3d):
-                            joint_selected.append(select_from_3d[_i])
-                            idx3d = select_from_3d[_i]
-                            final_scores_2d.append(cls_preds[idx3d])
-                            final_labels_2d.append(label_preds[idx3d])
-                            final_boxes_2d.append(
-                                box_preds_2d[idx3d, final_labels_2d[-1] - 1]
-                            )  # TODO use project 3d box?
-                            final_scores_3d.append(cls_preds[idx3d])
-                            final_labels_3d.append(label_preds[idx3d])
-                            final_boxes_3d.append(box_preds[idx3d])
-
-                            only3d_ious.append(max_iou_3d[_i].item())
-                            _i += 1
-                            only_in_3d += 1
 
-                        break
-                    if select_from_3d[_i] == select_from_2d[_j]:
-                        idx3d = select_from_3d[_i]
-                        joint_selected.append(idx3d)
-                        final_scores_2d.append(cls_fg_2d[idx3d])
-                        final_labels_2d.append(label_preds_2d[idx3d])
-                        final_boxes_2d.append(
-                            box_preds_2d[idx3d, final_labels_2d[-1] - 1]
-                        )
-                        final_scores_3d.append(cls_preds[idx3d])
-                        final_labels_3d.append(label_preds[idx3d])
-                        final_boxes_3d.append(box_preds[idx3d])
-                        both_ious.append(iou_matrix[_j, _i].item())
-                        _i += 1
-                        _j += 1
-                        both += 1
-
-                    elif select_from_3d[_i] < select_from_2d[_j]:
-                        joint_selected.append(select_from_3d[_i])
-                        idx3d = select_from_3d[_i]
-                        final_scores_2d.append(cls_preds[idx3d])
-                        final_labels_2d.append(label_preds[idx3d])
-                        final_boxes_2d.append(
-                            box_preds_2d[idx3d, final_labels_2d[-1] - 1]
-                        )  # TODO use project 3d box?
-                        final_scores_3d.append(cls_preds[idx3d])
-                        final_labels_3d.append(label_preds[idx3d])
-                        final_boxes_3d.append(box_preds[idx3d])
-
-                        only3d_ious.append(max_iou_3d[_i].item())
-                        _i += 1
-                        only_in_3d += 1
-
-                    else:
-                        joint_selected.append(select_from_2d[_j])
-                        idx2d = select_from_2d[_j]
-                        final_scores_2d.append(cls_fg_2d[idx2d])
-                        final_labels_2d.append(label_preds_2d[idx2d])
-                        final_boxes_2d.append(
-                            box_preds_2d[idx2d, final_labels_2d[-1] - 1]
-                        )
-                        final_scores_3d.append(cls_fg_2d[idx2d])
-                        final_labels_3d.append(label_preds_2d[idx2d])
-                        final_boxes_3d.append(box_preds[idx2d])
-
-                        only2d_ious.append(max_iou_2d[_j].item())
-                        _j += 1
-                        only_in_2d += 1
-
-                device = cls_preds.device
-                final_scores = torch.tensor(final_scores_3d, device=device)
-                final_labels = torch.tensor(final_labels_3d, device=device)
-                final_boxes = (
-                    torch.cat([x.view(1, -1) for x in final_boxes_3d], dim=0)
-                    if len(final_boxes_3d) > 0
-                    else torch.tensor([], device=device).view(0, 7)
+                # matched-IoU diagnostics: the k-th shared roi is the k-th
+                # member of the other branch inside each sorted list, so the
+                # masks recover the (row, col) pairs the merge walk read
+                shared_j = (
+                    in_3d_full[select_from_2d].nonzero(as_tuple=False).squeeze(1)
                 )
-
-                final_labels_2d = torch.tensor(final_labels_2d, device=device)
-                final_boxes_2d = (
-                    torch.cat([x.view(1, -1) for x in final_boxes_2d], dim=0)
-                    if len(final_boxes_2d) > 0
-                    else torch.tensor([], device=device).view(0, 4)
+                shared_i = (
+                    in_2d_full[select_from_3d].nonzero(as_tuple=False).squeeze(1)
                 )
-                final_scores_2d = torch.tensor(final_scores_2d, device=device)
+                only3d_ious = max_iou_3d[~in_2d_full[select_from_3d]].tolist()
+                only2d_ious = max_iou_2d[~in_3d_full[select_from_2d]].tolist()
+                both_ious = iou_matrix[shared_j, shared_i].tolist()
 
                 if len(final_boxes_2d) > 0:
-                    final_boxes_2d = recover_boxes_2d(
+                    final_boxes_2d = _recover_and_clip_2d(
                         final_boxes_2d, image_shape, new_shape
                     )
 
-                    # Convert to Boxes to use the `clip` function ...
-                    final_boxes_2d = Boxes(final_boxes_2d.reshape(-1, 4))
-                    final_boxes_2d.clip(image_shape)
-                    final_boxes_2d = final_boxes_2d.tensor.view(-1, 4)  # R x C x 4
-
             recall_dict = self.generate_recall_record(
                 box_preds=final_boxes if "rois" not in batch_dict else src_box_preds,
                 recall_dict=recall_dict,
@@ -1719,9 +1784,9 @@ class FusionRCNN(Detector3DTemplate):
                 "pred_boxes": final_boxes,
                 "pred_scores": final_scores,
                 "pred_labels": final_labels,
-                "pred_boxes2d": final_boxes_2d.cpu().numpy(),
-                "pred_scores2d": final_scores_2d.cpu().numpy(),
-                "pred_labels2d": final_labels_2d.cpu().numpy(),
+                "pred_boxes2d": _stage_to_cpu(final_boxes_2d),
+                "pred_scores2d": _stage_to_cpu(final_scores_2d),
+                "pred_labels2d": _stage_to_cpu(final_labels_2d),
                 "only_in_2d": only_in_2d,
                 "only_in_3d": only_in_3d,
                 "both": both,
@@ -1732,7 +1797,7 @@ class FusionRCNN(Detector3DTemplate):
             assert len(final_boxes) >= len(final_boxes_2d)
             pred_dicts.append(record_dict)
 
-        return pred_dicts, recall_dict
+        return _finalize_pred_dicts(pred_dicts), recall_dict
 
     def fusion_post_processing5(self, batch_dict):
         """
@@ -1771,8 +1836,10 @@ class FusionRCNN(Detector3DTemplate):
             image_valid_range = batch_dict["image_valid_range"][index]
 
             box_keep2d = batch_dict["batch_box_keep2d"][index]
-            cls_fg_2d, label_preds_2d = torch.max(cls_preds_2d[:, 1:], 1)
-            label_preds_2d += 1
+            # keep the raw 0-based argmax for box gathers; labels are its
+            # 1-based shift
+            cls_fg_2d, label_idx_2d = torch.max(cls_preds_2d[:, 1:], 1)
+            label_preds_2d = label_idx_2d + 1
             image_shape = batch_dict["image_shape"][index]
             new_shape = batch_dict["images"].image_sizes[index]
             roi_keep2d = batch_dict["batch_roi_keep2d"][index]
@@ -1781,7 +1848,7 @@ class FusionRCNN(Detector3DTemplate):
             src_box_preds = box_preds
 
             num_bbox_reg_classes = box_preds_2d.shape[1] // 4
-            box_preds_2d = box_preds_2d.reshape(-1, num_bbox_reg_classes, 4)
+            box_preds_2d = box_preds_2d.view(-1, num_bbox_reg_classes, 4)
 
             if not isinstance(batch_dict["batch_cls_preds"], list):
                 cls_preds = batch_dict["batch_cls_preds"][batch_mask]
@@ -1858,188 +1925,161 @@ class FusionRCNN(Detector3DTemplate):
 
                 select_from_3d, _ = torch.sort(selected)
                 select_from_2d, _ = torch.sort(box_keep2d)
-                final_scores_3d = []
-                final_scores_2d = []
-                final_labels_3d = []
-                final_labels_2d = []
-                final_boxes_2d = []
-                final_boxes_3d = []
-                _i = _j = 0
-                only_in_3d = 0
-                only_in_2d = 0
-                both = 0
-                only3d_ious = []
-                only2d_ious = []
-                both_ious = []
                 select_box2d = box_preds_2d[
-                    select_from_2d, (label_preds_2d[select_from_2d] - 1)
+                    select_from_2d, label_idx_2d[select_from_2d]
                 ].double()
                 select_box3d = box_preds[select_from_3d]
                 select_box3d, _ = lidar_box_to_image_box(select_box3d, calib)
 
-                select_box3d[:, 0].clamp_(
-                    image_valid_range[0], image_valid_range[2] - 1
-                )
-                select_box3d[:, 2].clamp_(
-                    image_valid_range[0], image_valid_range[2] - 1
-                )
-                select_box3d[:, 1].clamp_(
-                    image_valid_range[1], image_valid_range[3] - 1
-                )
-                select_box3d[:, 3].clamp_(
-                    image_valid_range[1], image_valid_range[3] - 1
-                )
+                # one broadcast clamp over (N, 4) instead of four strided
+                # per-coordinate kernels
+                valid_lo = image_valid_range[[0, 1, 0, 1]]
+                valid_hi = image_valid_range[[2, 3, 2, 3]] - 1
+                select_box3d.clamp_(min=valid_lo, max=valid_hi)
 
                 iou_matrix = boxes_iou_normal(select_box2d, select_box3d)
-                if iou_matrix.size(0) == 0 or iou_matrix.size(1) == 0:
-                    iou_matrix = torch.zeros(
-                        (max(1, iou_matrix.size(0)), max(1, iou_matrix.size(1))),
-                        device=iou_matrix.device,
-                    )
-                max_iou_2d, mathced_idx_2d = torch.max(iou_matrix, dim=1)
-                max_iou_3d, matched_idx_3d = torch.max(iou_matrix, dim=0)
-
-                indices_2d = set(select_from_2d.cpu().numpy())
-                indices_3d = set(select_from_3d.cpu().numpy())
+                if iou_matrix.numel() > 0:
+                    max_iou_2d = iou_matrix.max(dim=1).values
+                    max_iou_3d = iou_matrix.max(dim=0).values
+                else:
+                    # one side is empty: the other side matches nothing
+                    max_iou_2d = self._iou_zeros(iou_matrix, select_from_2d.shape[0])
+                    max_iou_3d = self._iou_zeros(iou_matrix, select_from_3d.shape[0])
 
                 cls_thresh_2d = self.model_cfg.POST_PROCESSING.CLS_THRESH_2D
                 cls_thresh_3d = self.model_cfg.POST_PROCESSING.CLS_THRESH_3D
                 iou_thresh = self.model_cfg.POST_PROCESSING.IOU_THRESH
 
-                inverse_idx_2d = {x.item(): i for i, x in enumerate(select_from_2d)}
-                inverse_idx_3d = {x.item(): i for i, x in enumerate(select_from_3d)}
-                indices_both = indices_2d & indices_3d
-                indices_2d -= indices_both
-                indices_3d -= indices_both
-                indices_2d = sorted(list(indices_2d))
-                indices_3d = sorted(list(indices_3d))
-
-                for idx in indices_both:
-                    final_scores_2d.append(cls_fg_2d[idx])
-                    final_labels_2d.append(label_preds_2d[idx])
-                    final_boxes_2d.append(box_preds_2d[idx, final_labels_2d[-1] - 1])
-                    final_scores_3d.append(cls_preds[idx])
-                    final_labels_3d.append(label_preds[idx])
-                    final_boxes_3d.append(box_preds[idx])
-                    _j = inverse_idx_2d[idx]
-                    _i = inverse_idx_3d[idx]
-                    both_ious.append(iou_matrix[_j, _i].item())
-                    both += 1
-                non_match = False
-                while len(indices_2d) > 0 or len(indices_3d) > 0:
-                    if len(indices_2d) == 0 or len(indices_3d) == 0 or non_match:
-                        while len(indices_2d) > 0:
-                            idx2d = indices_2d.pop()
-                            if cls_fg_2d[idx2d] >= cls_thresh_2d:
-                                final_scores_2d.append(cls_fg_2d[idx2d])
-                                final_labels_2d.append(label_preds_2d[idx2d])
-                                final_boxes_2d.append(
-                                    box_preds_2d[idx2d, final_labels_2d[-1] - 1]
-                                )
-                                final_scores_3d.append(cls_fg_2d[idx2d])
-                                final_labels_3d.append(label_preds_2d[idx2d])
-                                final_boxes_3d.append(box_preds[idx2d])
-                                _j = inverse_idx_2d[idx2d]
-                                only2d_ious.append(max_iou_2d[_j].item())
-                                only_in_2d += 1
-
-                        while len(indices_3d) > 0:
-                            idx3d = indices_3d.pop()
-                            if cls_preds[idx3d] > cls_thresh_3d:
-                                final_scores_2d.append(cls_preds[idx3d])
-                                final_labels_2d.append(label_preds[idx3d])
-                                final_boxes_2d.append(
-                                    box_preds_2d[idx3d, final_labels_2d[-1] - 1]
-                                )  # TODO use project 3d box?
-                                final_scores_3d.append(cls_preds[idx3d])
-                                final_labels_3d.append(label_preds[idx3d])
-                                final_boxes_3d.append(box_preds[idx3d])
-                                _i = inverse_idx_3d[idx3d]
-                                only3d_ious.append(max_iou_3d[_i].item())
-                                only_in_3d += 1
-
-                        break
-                    x_idx = [inverse_idx_2d[ii] for ii in indices_2d]
-                    y_idx = [inverse_idx_3d[jj] for jj in indices_3d]
-                    sub_iou_matrix = iou_matrix[x_idx][:, y_idx]
-                    max_idx = torch.argmax(sub_iou_matrix)
-                    _j, _i = int(max_idx // sub_iou_matrix.size(1)), int(
-                        max_idx % sub_iou_matrix.size(1)
-                    )
-
-                    if sub_iou_matrix[_j, _i] >= iou_thresh:  # TODO
-                        idx3d = indices_3d.pop(_i)
-                        idx2d = indices_2d.pop(_j)
-                        final_scores_2d.append(cls_fg_2d[idx2d])
-                        final_labels_2d.append(label_preds_2d[idx2d])
-                        final_boxes_2d.append(
-                            box_preds_2d[idx2d, final_labels_2d[-1] - 1]
-                        )
-                        final_scores_3d.append(cls_preds[idx3d])
-                        final_labels_3d.append(label_preds[idx3d])
-                        final_boxes_3d.append(box_preds[idx3d])
-                        both_ious.append(sub_iou_matrix[_j, _i].item())
-                        both += 1
-                    else:
-                        non_match = True
-
-                    # elif select_from_3d[_i] < select_from_2d[_j] :
-                    #     joint_selected.append(select_from_3d[_i])
-                    #     idx3d = select_from_3d[_i]
-                    #     final_scores_2d.append(cls_preds[idx3d])
-                    #     final_labels_2d.append(label_preds[idx3d])
-                    #     final_boxes_2d.append(
-                    #         box_preds_2d[idx3d, final_labels_2d[-1] - 1]) # TODO use project 3d box?
-                    #     final_scores_3d.append(cls_preds[idx3d])
-                    #     final_labels_3d.append(label_preds[idx3d])
-                    #     final_boxes_3d.append(box_preds[idx3d])
-                    #
-                    #     only3d_ious.append(max_iou_3d[_i].item())
-                    #     _i += 1
-                    #     only_in_3d += 1
-                    #
-                    # else:
-                    #     joint_selected.append(select_from_2d[_j])
-                    #     idx2d = select_from_2d[_j]
-                    #     final_scores_2d.append(cls_fg_2d[idx2d])
-                    #     final_labels_2d.append(label_preds_2d[idx2d])
-                    #     final_boxes_2d.append(
-                    #         box_preds_2d[idx2d, final_labels_2d[-1] - 1])
-                    #     final_scores_3d.append(cls_fg_2d[idx2d])
-                    #     final_labels_3d.append(label_preds_2d[idx2d])
-                    #     final_boxes_3d.append(box_preds[idx2d])
-                    #
-                    #     only2d_ious.append(max_iou_2d[_j].item())
-                    #     _j += 1
-                    #     only_in_2d += 1
-
-                device = cls_preds.device
-                final_scores = torch.tensor(final_scores_3d, device=device)
-                final_labels = torch.tensor(final_labels_3d, device=device)
-                final_boxes = (
-                    torch.cat([x.view(1, -1) for x in final_boxes_3d], dim=0)
-                    if len(final_boxes_3d) > 0
-                    else torch.tensor([], device=device).view(0, 7)
+                # membership masks over the roi range split the keep sets
+                # into shared and exclusive parts without python sets; the
+                # list-rank masks recover rows/cols of the IoU matrix
+                num_rois = box_preds.shape[0]
+                in_3d_full = torch.zeros(
+                    num_rois, dtype=torch.bool, device=selected.device
+                )
+                in_3d_full[select_from_3d] = True
+                in_2d_full = torch.zeros_like(in_3d_full)
+                in_2d_full[select_from_2d] = True
+                both_idx = (
+                    (in_3d_full & in_2d_full).nonzero(as_tuple=False).squeeze(1)
+                )
+                shared_j = (
+                    in_3d_full[select_from_2d].nonzero(as_tuple=False).squeeze(1)
+                )
+                shared_i = (
+                    in_2d_full[select_from_3d].nonzero(as_tuple=False).squeeze(1)
+                )
+                excl_j = (
+                    (~in_3d_full[select_from_2d])
+                    .nonzero(as_tuple=False)
+                    .squeeze(1)
+                )
+                excl_i = (
+                    (~in_2d_full[select_from_3d])
+                    .nonzero(as_tuple=False)
+                    .squeeze(1)
                 )
 
-                final_labels_2d = torch.tensor(final_labels_2d, device=device)
-                final_boxes_2d = (
-                    torch.cat([x.view(1, -1) for x in final_boxes_2d], dim=0)
-                    if len(final_boxes_2d) > 0
-                    else torch.tensor([], device=device).view(0, 4)
+                # index-identical detections pair up directly
+                scores_2d_parts = [cls_fg_2d[both_idx]]
+                labels_2d_parts = [label_preds_2d[both_idx]]
+                boxes_2d_parts = [
+                    box_preds_2d[both_idx, label_idx_2d[both_idx]]
+                ]
+                scores_3d_parts = [cls_preds[both_idx]]
+                labels_3d_parts = [label_preds[both_idx]]
+                boxes_3d_parts = [box_preds[both_idx]]
+                both_ious = iou_matrix[shared_j, shared_i].tolist()
+                both = int(both_idx.numel())
+
+                # greedy IoU matching over the exclusive leftovers: take the
+                # best remaining pair until it drops below the threshold,
+                # masking its row and column instead of rebuilding python
+                # index lists every iteration
+                matched_j, matched_i = [], []
+                if excl_j.numel() > 0 and excl_i.numel() > 0:
+                    sub_iou = iou_matrix[excl_j][:, excl_i].clone()
+                    while True:
+                        flat_idx = int(torch.argmax(sub_iou))
+                        _j, _i = divmod(flat_idx, sub_iou.size(1))
+                        pair_iou = float(sub_iou[_j, _i])
+                        if pair_iou < iou_thresh:
+                            break
+                        matched_j.append(_j)
+                        matched_i.append(_i)
+                        both_ious.append(pair_iou)
+                        sub_iou[_j, :] = -1.0
+                        sub_iou[:, _i] = -1.0
+
+                row_alive = torch.ones(
+                    excl_j.numel(), dtype=torch.bool, device=selected.device
+                )
+                col_alive = torch.ones(
+                    excl_i.numel(), dtype=torch.bool, device=selected.device
+                )
+                if len(matched_j) > 0:
+                    m_rows = torch.tensor(matched_j, device=selected.device)
+                    m_cols = torch.tensor(matched_i, device=selected.device)
+                    row_alive[m_rows] = False
+                    col_alive[m_cols] = False
+                    m2d = select_from_2d[excl_j[m_rows]]
+                    m3d = select_from_3d[excl_i[m_cols]]
+                    scores_2d_parts.append(cls_fg_2d[m2d])
+                    labels_2d_parts.append(label_preds_2d[m2d])
+                    boxes_2d_parts.append(
+                        box_preds_2d[m2d, label_idx_2d[m2d]]
+                    )
+                    scores_3d_parts.append(cls_preds[m3d])
+                    labels_3d_parts.append(label_preds[m3d])
+                    boxes_3d_parts.append(box_preds[m3d])
+                    both += len(matched_j)
+
+                # unmatched leftovers pass their class-score gates; flipped
+                # to keep the tail-pop (descending) order of the old walk
+                left_rows = excl_j[row_alive]
+                left2d = select_from_2d[left_rows]
+                keep2d = cls_fg_2d[left2d] >= cls_thresh_2d
+                left_rows = left_rows[keep2d].flip(0)
+                left2d = left2d[keep2d].flip(0)
+                scores_2d_parts.append(cls_fg_2d[left2d])
+                labels_2d_parts.append(label_preds_2d[left2d])
+                boxes_2d_parts.append(
+                    box_preds_2d[left2d, label_idx_2d[left2d]]
                 )
-                final_scores_2d = torch.tensor(final_scores_2d, device=device)
+                scores_3d_parts.append(cls_fg_2d[left2d])
+                labels_3d_parts.append(label_preds_2d[left2d])
+                boxes_3d_parts.append(box_preds[left2d])
+                only2d_ious = max_iou_2d[left_rows].tolist()
+                only_in_2d = int(left2d.numel())
+
+                left_cols = excl_i[col_alive]
+                left3d = select_from_3d[left_cols]
+                keep3d = cls_preds[left3d] > cls_thresh_3d
+                left_cols = left_cols[keep3d].flip(0)
+                left3d = left3d[keep3d].flip(0)
+                scores_2d_parts.append(cls_preds[left3d])
+                labels_2d_parts.append(label_preds[left3d])
+                boxes_2d_parts.append(
+                    box_preds_2d[left3d, label_preds[left3d] - 1]
+                )  # TODO use project 3d box?
+                scores_3d_parts.append(cls_preds[left3d])
+                labels_3d_parts.append(label_preds[left3d])
+                boxes_3d_parts.append(box_preds[left3d])
+                only3d_ious = max_iou_3d[left_cols].tolist()
+                only_in_3d = int(left3d.numel())
+
+                final_scores = torch.cat(scores_3d_parts)
+                final_labels = torch.cat(labels_3d_parts)
+                final_boxes = torch.cat(boxes_3d_parts)
+                final_scores_2d = torch.cat(scores_2d_parts)
+                final_labels_2d = torch.cat(labels_2d_parts)
+                final_boxes_2d = torch.cat(boxes_2d_parts)
 
                 if len(final_boxes_2d) > 0:
-                    final_boxes_2d = recover_boxes_2d(
+                    final_boxes_2d = _recover_and_clip_2d(
                         final_boxes_2d, image_shape, new_shape
                     )
 
-                    # Convert to Boxes to use the `clip` function ...
-                    final_boxes_2d = Boxes(final_boxes_2d.reshape(-1, 4))
-                    final_boxes_2d.clip(image_shape)
-                    final_boxes_2d = final_boxes_2d.tensor.view(-1, 4)  # R x C x 4
-
             recall_dict = self.generate_recall_record(
                 box_preds=final_boxes if "rois" not in batch_dict else src_box_preds,
                 recall_dict=recall_dict,
@@ -2052,9 +2092,9 @@ class FusionRCNN(Detector3DTemplate):
                 "pred_boxes": final_boxes,
                 "pred_scores": final_scores,
                 "pred_labels": final_labels,
-                "pred_boxes2d": final_boxes_2d.cpu().numpy(),
-                "pred_scores2d": final_scores_2d.cpu().numpy(),
-                "pred_labels2d": final_labels_2d.cpu().numpy(),
+                "pred_boxes2d": _stage_to_cpu(final_boxes_2d),
+                "pred_scores2d": _stage_to_cpu(final_scores_2d),
+                "pred_labels2d": _stage_to_cpu(final_labels_2d),
                 "only_in_2d": only_in_2d,
                 "only_in_3d": only_in_3d,
                 "both": both,
@@ -2065,7 +2105,7 @@ class FusionRCNN(Detector3DTemplate):
             assert len(final_boxes) >= len(final_boxes_2d)
             pred_dicts.append(record_dict)
 
-        return pred_dicts, recall_dict
+        return _finalize_pred_dicts(pred_dicts), recall_dict
 
     def fusion_post_processing6(self, batch_dict):
         # TODO Align 2d, 3d results
@@ -2152,8 +2192,10 @@ class FusionRCNN(Detector3DTemplate):
             box_preds_2d = batch_dict["batch_box_preds2d"][index]
 
             box_keep2d = batch_dict["batch_box_keep2d"][index]
-            cls_fg_2d, label_preds_2d = torch.max(cls_preds_2d[:, 1:], 1)
-            label_preds_2d += 1
+            # keep the raw 0-based argmax for box gathers; labels are its
+            # 1-based shift
+            cls_fg_2d, label_idx_2d = torch.max(cls_preds_2d[:, 1:], 1)
+            label_preds_2d = label_idx_2d + 1
             image_shape = batch_dict["image_shape"][index]
             new_shape = batch_dict["images"].image_sizes[index]
             roi_keep2d = batch_dict["batch_roi_keep2d"][index]
@@ -2165,8 +2207,7 @@ class FusionRCNN(Detector3DTemplate):
             #     print()
 
             num_bbox_reg_classes = box_preds_2d.shape[1] // 4
-            box_preds_2d = box_preds_2d.reshape(-1, num_bbox_reg_classes, 4)
-            src_label_preds_2d = label_preds_2d
+            box_preds_2d = box_preds_2d.view(-1, num_bbox_reg_classes, 4)
             if hasattr(self, "cls_map"):
                 selected_labels2d = label_preds_2d[box_keep2d]
                 selected_labels2d = self.cls_map[selected_labels2d]
@@ -2249,186 +2290,161 @@ class FusionRCNN(Detector3DTemplate):
 
                 select_from_3d, _ = torch.sort(selected)
                 select_from_2d, _ = torch.sort(box_keep2d)
-                final_scores_3d = []
-                final_scores_2d = []
-                final_labels_3d = []
-                final_labels_2d = []
-                final_boxes_2d = []
-                final_boxes_3d = []
-                _i = _j = 0
-                only_in_3d = 0
-                only_in_2d = 0
-                both = 0
-                only3d_ious = []
-                only2d_ious = []
-                both_ious = []
                 select_box2d = box_preds_2d[
-                    select_from_2d, (src_label_preds_2d[select_from_2d] - 1)
+                    select_from_2d, label_idx_2d[select_from_2d]
                 ].double()
                 select_box3d = box_preds[select_from_3d]
                 select_box3d, _ = lidar_box_to_image_box(select_box3d, calib)
-                select_box3d[:, 0].clamp_(
-                    image_valid_range[0], image_valid_range[2] - 1
-                )
-                select_box3d[:, 2].clamp_(
-                    image_valid_range[0], image_valid_range[2] - 1
-                )
-                select_box3d[:, 1].clamp_(
-                    image_valid_range[1], image_valid_range[3] - 1
-                )
-                select_box3d[:, 3].clamp_(
-                    image_valid_range[1], image_valid_range[3] - 1
-                )
-                iou_matrix = boxes_iou_normal(select_box2d, select_box3d)
-                if iou_matrix.size(0) == 0 or iou_matrix.size(1) == 0:
-                    iou_matrix = torch.zeros(
-                        (max(1, iou_matrix.size(0)), max(1, iou_matrix.size(1))),
-                        device=iou_matrix.device,
-                    )
-                max_iou_2d, mathced_idx_2d = torch.max(iou_matrix, dim=1)
-                max_iou_3d, matched_idx_3d = torch.max(iou_matrix, dim=0)
 
-                indices_2d = set(select_from_2d.cpu().numpy())
-                indices_3d = set(select_from_3d.cpu().numpy())
+                # one broadcast clamp over (N, 4) instead of four strided
+                # per-coordinate kernels
+                valid_lo = image_valid_range[[0, 1, 0, 1]]
+                valid_hi = image_valid_range[[2, 3, 2, 3]] - 1
+                select_box3d.clamp_(min=valid_lo, max=valid_hi)
+
+                iou_matrix = boxes_iou_normal(select_box2d, select_box3d)
+                if iou_matrix.numel() > 0:
+                    max_iou_2d = iou_matrix.max(dim=1).values
+                    max_iou_3d = iou_matrix.max(dim=0).values
+                else:
+                    # one side is empty: the other side matches nothing
+                    max_iou_2d = self._iou_zeros(iou_matrix, select_from_2d.shape[0])
+                    max_iou_3d = self._iou_zeros(iou_matrix, select_from_3d.shape[0])
 
                 cls_thresh_2d = self.model_cfg.POST_PROCESSING.CLS_THRESH_2D
                 cls_thresh_3d = self.model_cfg.POST_PROCESSING.CLS_THRESH_3D
                 iou_thresh = self.model_cfg.POST_PROCESSING.IOU_THRESH
 
-                inverse_idx_2d = {x.item(): i for i, x in enumerate(select_from_2d)}
-                inverse_idx_3d = {x.item(): i for i, x in enumerate(select_from_3d)}
-                indices_both = indices_2d & indices_3d
-                indices_2d -= indices_both
-                indices_3d -= indices_both
-                indices_2d = sorted(list(indices_2d))
-                indices_3d = sorted(list(indices_3d))
-
-                for idx in indices_both:
-                    final_scores_2d.append(cls_fg_2d[idx])
-                    final_labels_2d.append(label_preds_2d[idx])
-                    final_boxes_2d.append(box_preds_2d[idx, final_labels_2d[-1] - 1])
-                    final_scores_3d.append(cls_preds[idx])
-                    final_labels_3d.append(label_preds[idx])
-                    final_boxes_3d.append(box_preds[idx])
-                    _j = inverse_idx_2d[idx]
-                    _i = inverse_idx_3d[idx]
-                    both_ious.append(iou_matrix[_j, _i].item())
-                    both += 1
-                non_match = False
-                while len(indices_2d) > 0 or len(indices_3d) > 0:
-                    if len(indices_2d) == 0 or len(indices_3d) == 0 or non_match:
-                        while len(indices_2d) > 0:
-                            idx2d = indices_2d.pop()
-                            if cls_fg_2d[idx2d] >= cls_thresh_2d:
-                                final_scores_2d.append(cls_fg_2d[idx2d])
-                                final_labels_2d.append(label_preds_2d[idx2d])
-                                final_boxes_2d.append(
-                                    box_preds_2d[idx2d, final_labels_2d[-1] - 1]
-                                )
-                                final_scores_3d.append(cls_fg_2d[idx2d])
-                                final_labels_3d.append(label_preds_2d[idx2d])
-                                final_boxes_3d.append(box_preds[idx2d])
-                                _j = inverse_idx_2d[idx2d]
-                                only2d_ious.append(max_iou_2d[_j].item())
-                                only_in_2d += 1
-
-                        while len(indices_3d) > 0:
-                            idx3d = indices_3d.pop()
-                            if cls_preds[idx3d] > cls_thresh_3d:
-                                final_scores_2d.append(cls_preds[idx3d])
-                                final_labels_2d.append(label_preds[idx3d])
-                                final_boxes_2d.append(
-                                    box_preds_2d[idx3d, final_labels_2d[-1] - 1]
-                                )  # TODO use project 3d box?
-                                final_scores_3d.append(cls_preds[idx3d])
-                                final_labels_3d.append(label_preds[idx3d])
-                                final_boxes_3d.append(box_preds[idx3d])
-                                _i = inverse_idx_3d[idx3d]
-                                only3d_ious.append(max_iou_3d[_i].item())
-                                only_in_3d += 1
-
-                        break
-                    x_idx = [inverse_idx_2d[ii] for ii in indices_2d]
-                    y_idx = [inverse_idx_3d[jj] for jj in indices_3d]
-                    sub_iou_matrix = iou_matrix[x_idx][:, y_idx]
-                    max_idx = torch.argmax(sub_iou_matrix)
-                    _j, _i = int(max_idx // sub_iou_matrix.size(1)), int(
-                        max_idx % sub_iou_matrix.size(1)
-                    )
-
-                    if sub_iou_matrix[_j, _i] >= iou_thresh:  # TODO
-                        idx3d = indices_3d.pop(_i)
-                        idx2d = indices_2d.pop(_j)
-                        final_scores_2d.append(cls_fg_2d[idx2d])
-                        final_labels_2d.append(label_preds_2d[idx2d])
-                        final_boxes_2d.append(
-                            box_preds_2d[idx2d, final_labels_2d[-1] - 1]
-                        )
-                        final_scores_3d.append(cls_preds[idx3d])
-                        final_labels_3d.append(label_preds[idx3d])
-                        final_boxes_3d.append(box_preds[idx3d])
-                        both_ious.append(sub_iou_matrix[_j, _i].item())
-                        both += 1
-                    else:
-                        non_match = True
-
-                    # elif select_from_3d[_i] < select_from_2d[_j] :
-                    #     joint_selected.append(select_from_3d[_i])
-                    #     idx3d = select_from_3d[_i]
-                    #     final_scores_2d.append(cls_preds[idx3d])
-                    #     final_labels_2d.append(label_preds[idx3d])
-                    #     final_boxes_2d.append(
-                    #         box_preds_2d[idx3d, final_labels_2d[-1] - 1]) # TODO use project 3d box?
-                    #     final_scores_3d.append(cls_preds[idx3d])
-                    #     final_labels_3d.append(label_preds[idx3d])
-                    #     final_boxes_3d.append(box_preds[idx3d])
-                    #
-                    #     only3d_ious.append(max_iou_3d[_i].item())
-                    #     _i += 1
-                    #     only_in_3d += 1
-                    #
-                    # else:
-                    #     joint_selected.append(select_from_2d[_j])
-                    #     idx2d = select_from_2d[_j]
-                    #     final_scores_2d.append(cls_fg_2d[idx2d])
-                    #     final_labels_2d.append(label_preds_2d[idx2d])
-                    #     final_boxes_2d.append(
-                    #         box_preds_2d[idx2d, final_labels_2d[-1] - 1])
-                    #     final_scores_3d.append(cls_fg_2d[idx2d])
-                    #     final_labels_3d.append(label_preds_2d[idx2d])
-                    #     final_boxes_3d.append(box_preds[idx2d])
-                    #
-                    #     only2d_ious.append(max_iou_2d[_j].item())
-                    #     _j += 1
-                    #     only_in_2d += 1
-
-                device = cls_preds.device
-                final_scores = torch.tensor(final_scores_3d, device=device)
-                final_labels = torch.tensor(final_labels_3d, device=device)
-                final_boxes = (
-                    torch.cat([x.view(1, -1) for x in final_boxes_3d], dim=0)
-                    if len(final_boxes_3d) > 0
-                    else torch.tensor([], device=device).view(0, 7)
+                # membership masks over the roi range split the keep sets
+                # into shared and exclusive parts without python sets; the
+                # list-rank masks recover rows/cols of the IoU matrix
+                num_rois = box_preds.shape[0]
+                in_3d_full = torch.zeros(
+                    num_rois, dtype=torch.bool, device=selected.device
+                )
+                in_3d_full[select_from_3d] = True
+                in_2d_full = torch.zeros_like(in_3d_full)
+                in_2d_full[select_from_2d] = True
+                both_idx = (
+                    (in_3d_full & in_2d_full).nonzero(as_tuple=False).squeeze(1)
+                )
+                shared_j = (
+                    in_3d_full[select_from_2d].nonzero(as_tuple=False).squeeze(1)
+                )
+                shared_i = (
+                    in_2d_full[select_from_3d].nonzero(as_tuple=False).squeeze(1)
+                )
+                excl_j = (
+                    (~in_3d_full[select_from_2d])
+                    .nonzero(as_tuple=False)
+                    .squeeze(1)
+                )
+                excl_i = (
+                    (~in_2d_full[select_from_3d])
+                    .nonzero(as_tuple=False)
+                    .squeeze(1)
                 )
 
-                final_labels_2d = torch.tensor(final_labels_2d, device=device)
-                final_boxes_2d = (
-                    torch.cat([x.view(1, -1) for x in final_boxes_2d], dim=0)
-                    if len(final_boxes_2d) > 0
-                    else torch.tensor([], device=device).view(0, 4)
+                # index-identical detections pair up directly
+                scores_2d_parts = [cls_fg_2d[both_idx]]
+                labels_2d_parts = [label_preds_2d[both_idx]]
+                boxes_2d_parts = [
+                    box_preds_2d[both_idx, label_preds_2d[both_idx] - 1]
+                ]
+                scores_3d_parts = [cls_preds[both_idx]]
+                labels_3d_parts = [label_preds[both_idx]]
+                boxes_3d_parts = [box_preds[both_idx]]
+                both_ious = iou_matrix[shared_j, shared_i].tolist()
+                both = int(both_idx.numel())
+
+                # greedy IoU matching over the exclusive leftovers: take the
+                # best remaining pair until it drops below the threshold,
+                # masking its row and column instead of rebuilding python
+                # index lists every iteration
+                matched_j, matched_i = [], []
+                if excl_j.numel() > 0 and excl_i.numel() > 0:
+                    sub_iou = iou_matrix[excl_j][:, excl_i].clone()
+                    while True:
+                        flat_idx = int(torch.argmax(sub_iou))
+                        _j, _i = divmod(flat_idx, sub_iou.size(1))
+                        pair_iou = float(sub_iou[_j, _i])
+                        if pair_iou < iou_thresh:
+                            break
+                        matched_j.append(_j)
+                        matched_i.append(_i)
+                        both_ious.append(pair_iou)
+                        sub_iou[_j, :] = -1.0
+                        sub_iou[:, _i] = -1.0
+
+                row_alive = torch.ones(
+                    excl_j.numel(), dtype=torch.bool, device=selected.device
+                )
+                col_alive = torch.ones(
+                    excl_i.numel(), dtype=torch.bool, device=selected.device
                 )
-                final_scores_2d = torch.tensor(final_scores_2d, device=device)
+                if len(matched_j) > 0:
+                    m_rows = torch.tensor(matched_j, device=selected.device)
+                    m_cols = torch.tensor(matched_i, device=selected.device)
+                    row_alive[m_rows] = False
+                    col_alive[m_cols] = False
+                    m2d = select_from_2d[excl_j[m_rows]]
+                    m3d = select_from_3d[excl_i[m_cols]]
+                    scores_2d_parts.append(cls_fg_2d[m2d])
+                    labels_2d_parts.append(label_preds_2d[m2d])
+                    boxes_2d_parts.append(
+                        box_preds_2d[m2d, label_preds_2d[m2d] - 1]
+                    )
+                    scores_3d_parts.append(cls_preds[m3d])
+                    labels_3d_parts.append(label_preds[m3d])
+                    boxes_3d_parts.append(box_preds[m3d])
+                    both += len(matched_j)
+
+                # unmatched leftovers pass their class-score gates; flipped
+                # to keep the tail-pop (descending) order of the old walk
+                left_rows = excl_j[row_alive]
+                left2d = select_from_2d[left_rows]
+                keep2d = cls_fg_2d[left2d] >= cls_thresh_2d
+                left_rows = left_rows[keep2d].flip(0)
+                left2d = left2d[keep2d].flip(0)
+                scores_2d_parts.append(cls_fg_2d[left2d])
+                labels_2d_parts.append(label_preds_2d[left2d])
+                boxes_2d_parts.append(
+                    box_preds_2d[left2d, label_preds_2d[left2d] - 1]
+                )
+                scores_3d_parts.append(cls_fg_2d[left2d])
+                labels_3d_parts.append(label_preds_2d[left2d])
+                boxes_3d_parts.append(box_preds[left2d])
+                only2d_ious = max_iou_2d[left_rows].tolist()
+                only_in_2d = int(left2d.numel())
+
+                left_cols = excl_i[col_alive]
+                left3d = select_from_3d[left_cols]
+                keep3d = cls_preds[left3d] > cls_thresh_3d
+                left_cols = left_cols[keep3d].flip(0)
+                left3d = left3d[keep3d].flip(0)
+                scores_2d_parts.append(cls_preds[left3d])
+                labels_2d_parts.append(label_preds[left3d])
+                boxes_2d_parts.append(
+                    box_preds_2d[left3d, label_preds[left3d] - 1]
+                )  # TODO use project 3d box?
+                scores_3d_parts.append(cls_preds[left3d])
+                labels_3d_parts.append(label_preds[left3d])
+                boxes_3d_parts.append(box_preds[left3d])
+                only3d_ious = max_iou_3d[left_cols].tolist()
+                only_in_3d = int(left3d.numel())
+
+                final_scores = torch.cat(scores_3d_parts)
+                final_labels = torch.cat(labels_3d_parts)
+                final_boxes = torch.cat(boxes_3d_parts)
+                final_scores_2d = torch.cat(scores_2d_parts)
+                final_labels_2d = torch.cat(labels_2d_parts)
+                final_boxes_2d = torch.cat(boxes_2d_parts)
 
                 if len(final_boxes_2d) > 0:
-                    final_boxes_2d = recover_boxes_2d(
+                    final_boxes_2d = _recover_and_clip_2d(
                         final_boxes_2d, image_shape, new_shape
                     )
 
-                    # Convert to Boxes to use the `clip` function ...
-                    final_boxes_2d = Boxes(final_boxes_2d.reshape(-1, 4))
-                    final_boxes_2d.clip(image_shape)
-                    final_boxes_2d = final_boxes_2d.tensor.view(-1, 4)  # R x C x 4
-
             recall_dict = self.generate_recall_record(
                 box_preds=final_boxes if "rois" not in batch_dict else src_box_preds,
                 recall_dict=recall_dict,
@@ -2441,9 +2457,9 @@ class FusionRCNN(Detector3DTemplate):
                 "pred_boxes": final_boxes,
                 "pred_scores": final_scores,
                 "pred_labels": final_labels,
-                "pred_boxes2d": final_boxes_2d.cpu().numpy(),
-                "pred_scores2d": final_scores_2d.cpu().numpy(),
-                "pred_labels2d": final_labels_2d.cpu().numpy(),
+                "pred_boxes2d": _stage_to_cpu(final_boxes_2d),
+                "pred_scores2d": _stage_to_cpu(final_scores_2d),
+                "pred_labels2d": _stage_to_cpu(final_labels_2d),
                 "only_in_2d": only_in_2d,
                 "only_in_3d": only_in_3d,
                 "both": both,
@@ -2454,7 +2470,7 @@ class FusionRCNN(Detector3DTemplate):
             assert len(final_boxes) >= len(final_boxes_2d)
             pred_dicts.append(record_dict)
 
-        return pred_dicts, recall_dict
+        return _finalize_pred_dicts(pred_dicts), recall_dict
 
     # def fusion_post_processing8(self, batch_dict):
     #     """
@@ -2814,141 +2830,135 @@ class FusionRCNN(Detector3DTemplate):
                 selected_boxes_2d = selected_boxes_2d[mask]
 
             # union 2d & 3d results
-            final_scores_3d = []
-            final_scores_2d = []
-            final_labels_3d = []
-            final_labels_2d = []
-            final_boxes_2d = []
-            final_boxes_3d = []
-            only_in_3d = 0
-            only_in_2d = 0
-            both = 0
-            only3d_ious = []
-            only2d_ious = []
-            both_ious = []
-
             select_project_box = box_preds_3d[select_from_3d]
             select_project_box, _ = lidar_box_to_image_box(select_project_box, calib)
-            select_project_box[:, 0].clamp_(
-                image_valid_range[0], image_valid_range[2] - 1
-            )
-            select_project_box[:, 2].clamp_(
-                image_valid_range[0], image_valid_range[2] - 1
-            )
-            select_project_box[:, 1].clamp_(
-                image_valid_range[1], image_valid_range[3] - 1
-            )
-            select_project_box[:, 3].clamp_(
-                image_valid_range[1], image_valid_range[3] - 1
-            )
+            # one broadcast clamp over (N, 4) instead of four strided
+            # per-coordinate kernels
+            valid_lo = image_valid_range[[0, 1, 0, 1]]
+            valid_hi = image_valid_range[[2, 3, 2, 3]] - 1
+            select_project_box.clamp_(min=valid_lo, max=valid_hi)
             iou_matrix = boxes_iou_normal(selected_boxes_2d, select_project_box)
-            if iou_matrix.size(0) == 0 or iou_matrix.size(1) == 0:
-                iou_matrix = torch.zeros(
-                    (max(1, iou_matrix.size(0)), max(1, iou_matrix.size(1))),
-                    device=iou_matrix.device,
-                )
-            max_iou_2d, mathced_idx_2d = torch.max(iou_matrix, dim=1)
-            max_iou_3d, matched_idx_3d = torch.max(iou_matrix, dim=0)
-
-            indices_2d = set(select_from_2d.cpu().numpy())
-            indices_3d = set(select_from_3d.cpu().numpy())
+            if iou_matrix.numel() > 0:
+                max_iou_2d = iou_matrix.max(dim=1).values
+                max_iou_3d = iou_matrix.max(dim=0).values
+            else:
+                # one side is empty: the other side matches nothing
+                max_iou_2d = self._iou_zeros(iou_matrix, select_from_2d.shape[0])
+                max_iou_3d = self._iou_zeros(iou_matrix, select_from_3d.shape[0])
 
             cls_thresh_2d = self.model_cfg.POST_PROCESSING.CLS_THRESH_2D
             cls_thresh_3d = self.model_cfg.POST_PROCESSING.CLS_THRESH_3D
             iou_thresh = self.model_cfg.POST_PROCESSING.IOU_THRESH
 
-            inverse_idx_2d = {x.item(): i for i, x in enumerate(select_from_2d)}
-            inverse_idx_3d = {x.item(): i for i, x in enumerate(select_from_3d)}
-            indices_both = indices_2d & indices_3d
-            indices_2d -= indices_both
-            indices_3d -= indices_both
-            indices_2d = sorted(list(indices_2d))
-            indices_3d = sorted(list(indices_3d))
-
-            for idx in indices_both:
-                _j = inverse_idx_2d[idx]
-                _i = inverse_idx_3d[idx]
-                final_scores_2d.append(cls_preds_2d[_j])
-                final_labels_2d.append(label_preds_2d[_j])
-                final_boxes_2d.append(selected_boxes_2d[_j])
-                final_scores_3d.append(cls_preds_3d[idx])
-                final_labels_3d.append(label_preds_3d[idx])
-                final_boxes_3d.append(box_preds_3d[idx])
-
-                both_ious.append(iou_matrix[_j, _i].item())
-                both += 1
-            non_match = False
-            while len(indices_2d) > 0 or len(indices_3d) > 0:
-                if len(indices_2d) == 0 or len(indices_3d) == 0 or non_match:
-                    while len(indices_2d) > 0:
-                        idx2d = indices_2d.pop()
-                        _j = inverse_idx_2d[idx2d]
-                        if cls_preds_2d[_j] >= cls_thresh_2d:
-                            final_scores_2d.append(cls_preds_2d[_j])
-                            final_labels_2d.append(label_preds_2d[_j])
-                            final_boxes_2d.append(selected_boxes_2d[_j])
-                            final_scores_3d.append(cls_preds_2d[_j])
-                            final_labels_3d.append(label_preds_2d[_j])
-                            final_boxes_3d.append(box_preds_3d[idx2d])
-                            only2d_ious.append(max_iou_2d[_j].item())
-                            only_in_2d += 1
-
-                    while len(indices_3d) > 0:
-                        idx3d = indices_3d.pop()
-                        _i = inverse_idx_3d[idx3d]
-                        if cls_preds_3d[idx3d] > cls_thresh_3d:
-                            final_scores_2d.append(cls_preds_3d[idx3d])
-                            final_labels_2d.append(label_preds_3d[idx3d])
-                            final_boxes_2d.append(
-                                select_project_box[_i]
-                            )  # TODO use project 3d box?
-                            final_scores_3d.append(cls_preds_3d[idx3d])
-                            final_labels_3d.append(label_preds_3d[idx3d])
-                            final_boxes_3d.append(box_preds_3d[idx3d])
-                            only3d_ious.append(max_iou_3d[_i].item())
-                            only_in_3d += 1
-
-                    break
-                x_idx = [inverse_idx_2d[ii] for ii in indices_2d]
-                y_idx = [inverse_idx_3d[jj] for jj in indices_3d]
-                sub_iou_matrix = iou_matrix[x_idx][:, y_idx]
-                max_idx = torch.argmax(sub_iou_matrix)
-                _j, _i = int(max_idx // sub_iou_matrix.size(1)), int(
-                    max_idx % sub_iou_matrix.size(1)
-                )
-
-                if sub_iou_matrix[_j, _i] >= iou_thresh:  # TODO
-                    idx3d = indices_3d.pop(_i)
-                    idx2d = indices_2d.pop(_j)
-                    _j = inverse_idx_2d[idx2d]
-                    _i = inverse_idx_3d[idx3d]
-                    final_scores_2d.append(cls_preds_2d[_j])
-                    final_labels_2d.append(label_preds_2d[_j])
-                    final_boxes_2d.append(selected_boxes_2d[_j])
-                    final_scores_3d.append(cls_preds_3d[idx3d])
-                    final_labels_3d.append(label_preds_3d[idx3d])
-                    final_boxes_3d.append(box_preds_3d[idx3d])
-                    both_ious.append(iou_matrix[_j, _i].item())
-                    both += 1
-                else:
-                    non_match = True
-
+            # scatter position tables replace the inverse-index dicts: the
+            # select lists are unsorted here, so a roi-indexed lookup table
+            # plays the role searchsorted would on sorted lists
+            num_rois = box_preds_3d.shape[0]
             device = cls_preds_3d.device
-            final_scores_3d = torch.tensor(final_scores_3d, device=device)
-            final_labels_3d = torch.tensor(final_labels_3d, device=device)
-            final_boxes_3d = (
-                torch.cat([x.view(1, -1) for x in final_boxes_3d], dim=0)
-                if len(final_boxes_3d) > 0
-                else torch.tensor([], device=device).view(0, 7)
+            pos_2d = torch.full((num_rois,), -1, dtype=torch.long, device=device)
+            pos_2d[select_from_2d] = torch.arange(
+                select_from_2d.numel(), device=device
             )
-
-            final_labels_2d = torch.tensor(final_labels_2d, device=device)
-            final_boxes_2d = (
-                torch.cat([x.view(1, -1) for x in final_boxes_2d], dim=0)
-                if len(final_boxes_2d) > 0
-                else torch.tensor([], device=device).view(0, 4)
+            pos_3d = torch.full((num_rois,), -1, dtype=torch.long, device=device)
+            pos_3d[select_from_3d] = torch.arange(
+                select_from_3d.numel(), device=device
+            )
+            in_2d_full = pos_2d >= 0
+            in_3d_full = pos_3d >= 0
+
+            # index-identical detections pair up directly
+            both_idx = (in_2d_full & in_3d_full).nonzero(as_tuple=False).squeeze(1)
+            both_j = pos_2d[both_idx]
+            both_i = pos_3d[both_idx]
+            scores_2d_parts = [cls_preds_2d[both_j]]
+            labels_2d_parts = [label_preds_2d[both_j]]
+            boxes_2d_parts = [selected_boxes_2d[both_j]]
+            scores_3d_parts = [cls_preds_3d[both_idx]]
+            labels_3d_parts = [label_preds_3d[both_idx]]
+            boxes_3d_parts = [box_preds_3d[both_idx]]
+            both_ious = iou_matrix[both_j, both_i].tolist()
+            both = int(both_idx.numel())
+
+            # greedy IoU matching over the exclusive leftovers, masking
+            # matched rows/columns in place (see strategy 5)
+            excl_roi_2d = (
+                (in_2d_full & ~in_3d_full).nonzero(as_tuple=False).squeeze(1)
+            )
+            excl_roi_3d = (
+                (in_3d_full & ~in_2d_full).nonzero(as_tuple=False).squeeze(1)
             )
-            final_scores_2d = torch.tensor(final_scores_2d, device=device)
+            excl_j = pos_2d[excl_roi_2d]
+            excl_i = pos_3d[excl_roi_3d]
+            matched_j, matched_i = [], []
+            if excl_j.numel() > 0 and excl_i.numel() > 0:
+                sub_iou = iou_matrix[excl_j][:, excl_i].clone()
+                while True:
+                    flat_idx = int(torch.argmax(sub_iou))
+                    _j, _i = divmod(flat_idx, sub_iou.size(1))
+                    pair_iou = float(sub_iou[_j, _i])
+                    if pair_iou < iou_thresh:
+                        break
+                    matched_j.append(_j)
+                    matched_i.append(_i)
+                    both_ious.append(pair_iou)
+                    sub_iou[_j, :] = -1.0
+                    sub_iou[:, _i] = -1.0
+
+            row_alive = torch.ones(excl_j.numel(), dtype=torch.bool, device=device)
+            col_alive = torch.ones(excl_i.numel(), dtype=torch.bool, device=device)
+            if len(matched_j) > 0:
+                m_rows = torch.tensor(matched_j, device=device)
+                m_cols = torch.tensor(matched_i, device=device)
+                row_alive[m_rows] = False
+                col_alive[m_cols] = False
+                m2d = excl_j[m_rows]
+                m3d_roi = excl_roi_3d[m_cols]
+                scores_2d_parts.append(cls_preds_2d[m2d])
+                labels_2d_parts.append(label_preds_2d[m2d])
+                boxes_2d_parts.append(selected_boxes_2d[m2d])
+                scores_3d_parts.append(cls_preds_3d[m3d_roi])
+                labels_3d_parts.append(label_preds_3d[m3d_roi])
+                boxes_3d_parts.append(box_preds_3d[m3d_roi])
+                both += len(matched_j)
+
+            # unmatched leftovers pass their class-score gates; flipped to
+            # keep the tail-pop (descending) order of the old walk
+            left_rows = excl_j[row_alive]
+            left_roi_2d = excl_roi_2d[row_alive]
+            keep2d = cls_preds_2d[left_rows] >= cls_thresh_2d
+            left_rows = left_rows[keep2d].flip(0)
+            left_roi_2d = left_roi_2d[keep2d].flip(0)
+            scores_2d_parts.append(cls_preds_2d[left_rows])
+            labels_2d_parts.append(label_preds_2d[left_rows])
+            boxes_2d_parts.append(selected_boxes_2d[left_rows])
+            scores_3d_parts.append(cls_preds_2d[left_rows])
+            labels_3d_parts.append(label_preds_2d[left_rows])
+            boxes_3d_parts.append(box_preds_3d[left_roi_2d])
+            only2d_ious = max_iou_2d[left_rows].tolist()
+            only_in_2d = int(left_rows.numel())
+
+            left_cols = excl_i[col_alive]
+            left_roi_3d = excl_roi_3d[col_alive]
+            keep3d = cls_preds_3d[left_roi_3d] > cls_thresh_3d
+            left_cols = left_cols[keep3d].flip(0)
+            left_roi_3d = left_roi_3d[keep3d].flip(0)
+            scores_2d_parts.append(cls_preds_3d[left_roi_3d])
+            labels_2d_parts.append(label_preds_3d[left_roi_3d])
+            boxes_2d_parts.append(
+                select_project_box[left_cols]
+            )  # TODO use project 3d box?
+            scores_3d_parts.append(cls_preds_3d[left_roi_3d])
+            labels_3d_parts.append(label_preds_3d[left_roi_3d])
+            boxes_3d_parts.append(box_preds_3d[left_roi_3d])
+            only3d_ious = max_iou_3d[left_cols].tolist()
+            only_in_3d = int(left_roi_3d.numel())
+
+            final_scores_3d = torch.cat(scores_3d_parts)
+            final_labels_3d = torch.cat(labels_3d_parts)
+            final_boxes_3d = torch.cat(boxes_3d_parts)
+            final_scores_2d = torch.cat(scores_2d_parts)
+            final_labels_2d = torch.cat(labels_2d_parts)
+            final_boxes_2d = torch.cat(boxes_2d_parts)
             inverse_labels_2d = final_labels_2d.long()
             if hasattr(self, "inverse_cls_map") and len(inverse_labels_2d) > 0:
                 inverse_labels_2d = self.inverse_cls_map[inverse_labels_2d]
@@ -2979,9 +2989,9 @@ class FusionRCNN(Detector3DTemplate):
                 "pred_boxes": final_boxes_3d,
                 "pred_scores": final_scores_3d,
                 "pred_labels": final_labels_3d,
-                "pred_boxes2d": final_boxes_2d.cpu().numpy(),
-                "pred_scores2d": final_scores_2d.cpu().numpy(),
-                "pred_labels2d": final_labels_2d.cpu().numpy(),
+                "pred_boxes2d": _stage_to_cpu(final_boxes_2d),
+                "pred_scores2d": _stage_to_cpu(final_scores_2d),
+                "pred_labels2d": _stage_to_cpu(final_labels_2d),
                 "only_in_2d": only_in_2d,
                 "only_in_3d": only_in_3d,
                 "both": both,
@@ -3008,7 +3018,7 @@ class FusionRCNN(Detector3DTemplate):
             for i in range(batch_size):
                 pred_dicts[i]["pred_masks2d"] = []
 
-        return pred_dicts, recall_dict
+        return _finalize_pred_dicts(pred_dicts), recall_dict
 
     def fusion_post_processing9(self, batch_dict, ret_recall=True):
         """
@@ -3094,142 +3104,63 @@ class FusionRCNN(Detector3DTemplate):
                 cls_preds_2d = cls_preds_2d[mask]
                 selected_boxes_2d = selected_boxes_2d[mask]
 
-            # union 2d & 3d results
-            final_scores_3d = []
-            final_scores_2d = []
-            final_labels_3d = []
-            final_labels_2d = []
-            final_boxes_2d = []
-            final_boxes_3d = []
-            only_in_3d = 0
-            only_in_2d = 0
-            both = 0
-            only3d_ious = []
-            only2d_ious = []
-            both_ious = []
-
+            # union 2d & 3d results: greedy IoU matching only (the shared
+            # and leftover passes stay disabled, matching the old walk)
             select_project_box = box_preds_3d[select_from_3d]
             select_project_box, _ = lidar_box_to_image_box(select_project_box, calib)
-            select_project_box[:, 0].clamp_(
-                image_valid_range[0], image_valid_range[2] - 1
-            )
-            select_project_box[:, 2].clamp_(
-                image_valid_range[0], image_valid_range[2] - 1
-            )
-            select_project_box[:, 1].clamp_(
-                image_valid_range[1], image_valid_range[3] - 1
-            )
-            select_project_box[:, 3].clamp_(
-                image_valid_range[1], image_valid_range[3] - 1
-            )
+            valid_lo = image_valid_range[[0, 1, 0, 1]]
+            valid_hi = image_valid_range[[2, 3, 2, 3]] - 1
+            select_project_box.clamp_(min=valid_lo, max=valid_hi)
             iou_matrix = boxes_iou_normal(selected_boxes_2d, select_project_box)
-            if iou_matrix.size(0) == 0 or iou_matrix.size(1) == 0:
-                iou_matrix = torch.zeros(
-                    (max(1, iou_matrix.size(0)), max(1, iou_matrix.size(1))),
-                    device=iou_matrix.device,
-                )
-            max_iou_2d, mathced_idx_2d = torch.max(iou_matrix, dim=1)
-            max_iou_3d, matched_idx_3d = torch.max(iou_matrix, dim=0)
-
-            indices_2d = set(select_from_2d.cpu().numpy())
-            indices_3d = set(select_from_3d.cpu().numpy())
 
-            cls_thresh_2d = self.model_cfg.POST_PROCESSING.CLS_THRESH_2D
-            cls_thresh_3d = self.model_cfg.POST_PROCESSING.CLS_THRESH_3D
             iou_thresh = self.model_cfg.POST_PROCESSING.IOU_THRESH
 
-            inverse_idx_2d = {x.item(): i for i, x in enumerate(select_from_2d)}
-            inverse_idx_3d = {x.item(): i for i, x in enumerate(select_from_3d)}
-            # indices_both = indices_2d & indices_3d
-            # indices_2d -= indices_both
-            # indices_3d -= indices_both
-            indices_2d = sorted(list(indices_2d))
-            indices_3d = sorted(list(indices_3d))
-            #
-            # for idx in indices_both:
-            #     _j = inverse_idx_2d[idx]
-            #     _i = inverse_idx_3d[idx]
-            #     final_scores_2d.append(cls_preds_2d[_j])
-            #     final_labels_2d.append(label_preds_2d[_j])
-            #     final_boxes_2d.append(selected_boxes_2d[_j])
-            #     final_scores_3d.append(cls_preds_3d[idx])
-            #     final_labels_3d.append(label_preds_3d[idx])
-            #     final_boxes_3d.append(box_preds_3d[idx])
-            #
-            #     both_ious.append(iou_matrix[_j, _i].item())
-            #     both += 1
-            non_match = False
-            while len(indices_2d) > 0 or len(indices_3d) > 0:
-                if len(indices_2d) == 0 or len(indices_3d) == 0 or non_match:
-                    # while len(indices_2d) > 0:
-                    #
-                    #     idx2d = indices_2d.pop()
-                    #     _j = inverse_idx_2d[idx2d]
-                    #     if cls_preds_2d[_j] >= cls_thresh_2d:
-                    #         final_scores_2d.append(cls_preds_2d[_j])
-                    #         final_labels_2d.append(label_preds_2d[_j])
-                    #         final_boxes_2d.append(selected_boxes_2d[_j])
-                    #         final_scores_3d.append(cls_preds_2d[_j])
-                    #         final_labels_3d.append(label_preds_2d[_j])
-                    #         final_boxes_3d.append(box_preds_3d[idx2d])
-                    #         only2d_ious.append(max_iou_2d[_j].item())
-                    #         only_in_2d += 1
-                    #
-                    # while len(indices_3d) > 0:
-                    #     idx3d = indices_3d.pop()
-                    #     _i = inverse_idx_3d[idx3d]
-                    #     if cls_preds_3d[idx3d] > cls_thresh_3d:
-                    #         final_scores_2d.append(cls_preds_3d[idx3d])
-                    #         final_labels_2d.append(label_preds_3d[idx3d])
-                    #         final_boxes_2d.append(select_project_box[
-                    #                                   _i])  # TODO use project 3d box?
-                    #         final_scores_3d.append(cls_preds_3d[idx3d])
-                    #         final_labels_3d.append(label_preds_3d[idx3d])
-                    #         final_boxes_3d.append(box_preds_3d[idx3d])
-                    #         only3d_ious.append(max_iou_3d[_i].item())
-                    #         only_in_3d += 1
-
-                    break
-                x_idx = [inverse_idx_2d[ii] for ii in indices_2d]
-                y_idx = [inverse_idx_3d[jj] for jj in indices_3d]
-                sub_iou_matrix = iou_matrix[x_idx][:, y_idx]
-                max_idx = torch.argmax(sub_iou_matrix)
-                _j, _i = int(max_idx // sub_iou_matrix.size(1)), int(
-                    max_idx % sub_iou_matrix.size(1)
-                )
-
-                if sub_iou_matrix[_j, _i] >= iou_thresh:  # TODO
-                    idx3d = indices_3d.pop(_i)
-                    idx2d = indices_2d.pop(_j)
-                    _j = inverse_idx_2d[idx2d]
-                    _i = inverse_idx_3d[idx3d]
-                    final_scores_2d.append(cls_preds_2d[_j])
-                    final_labels_2d.append(label_preds_2d[_j])
-                    final_boxes_2d.append(selected_boxes_2d[_j])
-                    final_scores_3d.append(cls_preds_3d[idx3d])
-                    final_labels_3d.append(label_preds_3d[idx3d])
-                    final_boxes_3d.append(box_preds_3d[idx3d])
-                    both_ious.append(iou_matrix[_j, _i].item())
-                    both += 1
-                else:
-                    non_match = True
-
+            # scatter position tables replace the inverse-index dicts: the
+            # select lists are unsorted here, so a roi-indexed lookup table
+            # plays the role searchsorted would on sorted lists
+            num_rois = box_preds_3d.shape[0]
             device = cls_preds_3d.device
-            final_scores_3d = torch.tensor(final_scores_3d, device=device)
-            final_labels_3d = torch.tensor(final_labels_3d, device=device)
-            final_boxes_3d = (
-                torch.cat([x.view(1, -1) for x in final_boxes_3d], dim=0)
-                if len(final_boxes_3d) > 0
-                else torch.tensor([], device=device).view(0, 7)
+            pos_2d = torch.full((num_rois,), -1, dtype=torch.long, device=device)
+            pos_2d[select_from_2d] = torch.arange(
+                select_from_2d.numel(), device=device
             )
-
-            final_labels_2d = torch.tensor(final_labels_2d, device=device)
-            final_boxes_2d = (
-                torch.cat([x.view(1, -1) for x in final_boxes_2d], dim=0)
-                if len(final_boxes_2d) > 0
-                else torch.tensor([], device=device).view(0, 4)
+            pos_3d = torch.full((num_rois,), -1, dtype=torch.long, device=device)
+            pos_3d[select_from_3d] = torch.arange(
+                select_from_3d.numel(), device=device
             )
-            final_scores_2d = torch.tensor(final_scores_2d, device=device)
+            cand_j = pos_2d[pos_2d >= 0]
+            cand_i = pos_3d[pos_3d >= 0]
+
+            matched_j, matched_i = [], []
+            both_ious = []
+            if cand_j.numel() > 0 and cand_i.numel() > 0:
+                sub_iou = iou_matrix[cand_j][:, cand_i].clone()
+                while True:
+                    flat_idx = int(torch.argmax(sub_iou))
+                    _j, _i = divmod(flat_idx, sub_iou.size(1))
+                    pair_iou = float(sub_iou[_j, _i])
+                    if pair_iou < iou_thresh:
+                        break
+                    matched_j.append(_j)
+                    matched_i.append(_i)
+                    both_ious.append(pair_iou)
+                    sub_iou[_j, :] = -1.0
+                    sub_iou[:, _i] = -1.0
+
+            m_rows = torch.tensor(matched_j, dtype=torch.long, device=device)
+            m_cols = torch.tensor(matched_i, dtype=torch.long, device=device)
+            m2d = cand_j[m_rows]
+            m3d_roi = select_from_3d[cand_i[m_cols]]
+            final_scores_2d = cls_preds_2d[m2d]
+            final_labels_2d = label_preds_2d[m2d]
+            final_boxes_2d = selected_boxes_2d[m2d]
+            final_scores_3d = cls_preds_3d[m3d_roi]
+            final_labels_3d = label_preds_3d[m3d_roi]
+            final_boxes_3d = box_preds_3d[m3d_roi]
+            both = len(matched_j)
+            only_in_2d = only_in_3d = 0
+            only2d_ious = []
+            only3d_ious = []
             inverse_labels_2d = final_labels_2d.long()
             if hasattr(self, "inverse_cls_map") and len(inverse_labels_2d) > 0:
                 inverse_labels_2d = self.inverse_cls_map[inverse_labels_2d]
@@ -3260,9 +3191,9 @@ class FusionRCNN(Detector3DTemplate):
                 "pred_boxes": final_boxes_3d,
                 "pred_scores": final_scores_3d,
                 "pred_labels": final_labels_3d,
-                "pred_boxes2d": final_boxes_2d.cpu().numpy(),
-                "pred_scores2d": final_scores_2d.cpu().numpy(),
-                "pred_labels2d": final_labels_2d.cpu().numpy(),
+                "pred_boxes2d": _stage_to_cpu(final_boxes_2d),
+                "pred_scores2d": _stage_to_cpu(final_scores_2d),
+                "pred_labels2d": _stage_to_cpu(final_labels_2d),
                 "only_in_2d": only_in_2d,
                 "only_in_3d": only_in_3d,
                 "both": both,
@@ -3289,4 +3220,4 @@ class FusionRCNN(Detector3DTemplate):
             for i in range(batch_size):
                 pred_dicts[i]["pred_masks2d"] = []
 
-        return pred_dicts, recall_dict
+        return _finalize_pred_dicts(pred_dicts), recall_dict
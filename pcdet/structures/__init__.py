@@ -3,6 +3,7 @@ from .boxes import Boxes, BoxMode, pairwise_iou, pairwise_ioa
 from .image_list import ImageList
 
 from .instances import Instances
+from .batched_instances import BatchedInstances
 from .keypoints import Keypoints, heatmaps_to_keypoints
 from .masks import (
     BitMasks,
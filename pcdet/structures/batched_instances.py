@@ -0,0 +1,38 @@
+from .boxes import Boxes
+from .instances import Instances
+
+
+class BatchedInstances(object):
+    """Dense batched form of the per-sample ground-truth Instances.
+
+    The collator keeps the 2D ground truth as padded tensors plus lengths
+    so it does not pay the per-sample Instances/Boxes construction cost in
+    the worker; to_instances() materializes the per-image objects once the
+    model actually needs them.
+    """
+
+    def __init__(self, boxes, labels, lengths, image_shapes):
+        self.boxes = boxes  # (B, M, 4)
+        self.labels = labels  # (B, M)
+        self.lengths = lengths  # (B,)
+        self.image_shapes = image_shapes  # list of (h, w)
+
+    def __len__(self):
+        return len(self.image_shapes)
+
+    def to(self, *args, **kwargs):
+        return BatchedInstances(
+            self.boxes.to(*args, **kwargs),
+            self.labels.to(*args, **kwargs),
+            self.lengths,
+            self.image_shapes,
+        )
+
+    def to_instances(self):
+        instances = []
+        for i, n in enumerate(self.lengths.tolist()):
+            instance = Instances(tuple(self.image_shapes[i]))
+            instance.gt_boxes = Boxes(self.boxes[i, :n])
+            instance.gt_classes = self.labels[i, :n]
+            instances.append(instance)
+        return instances
@@ -429,6 +429,38 @@ def boxes3d_nearest_bev_iou(boxes_a, boxes_b):
     return boxes_iou_normal(boxes_bev_a, boxes_bev_b)
 
 
+def recover_boxes_2d_batch(flat_boxes, original_shapes, resized_shapes, counts):
+    """Batched recover_boxes_2d over concatenated per-sample boxes.
+
+    Args:
+        flat_boxes: (M, 4) boxes of the whole batch, modified in place
+        original_shapes: (B, 2) original (h, w) per sample
+        resized_shapes: (B, 2) resized (h, w) per sample
+        counts: (B,) number of boxes per sample
+
+    Expands the per-sample un-letterbox offsets and ratio to per-box
+    vectors so the whole batch is recovered in one pass.
+    """
+    original_shapes = np.asarray(original_shapes, dtype=np.float64)
+    resized_shapes = np.asarray(resized_shapes, dtype=np.float64)
+    r = np.minimum(
+        resized_shapes[:, 0] / original_shapes[:, 0],
+        resized_shapes[:, 1] / original_shapes[:, 1],
+    )
+    new_unpad = np.rint(original_shapes * r[:, None])
+    pad = resized_shapes - new_unpad  # (B, 2) as (dh, dw)
+
+    # samples whose shapes already match are identity, as in the scalar path
+    unchanged = np.isclose(original_shapes, resized_shapes).all(axis=1)
+    r[unchanged] = 1.0
+    pad[unchanged] = 0.0
+
+    flat_boxes[:, (0, 2)] -= np.repeat(pad[:, 1] // 2, counts)[:, None]
+    flat_boxes[:, (1, 3)] -= np.repeat(pad[:, 0] // 2, counts)[:, None]
+    flat_boxes /= np.repeat(r, counts)[:, None]
+    return flat_boxes
+
+
 def recover_boxes_2d(resized_boxes, original_shape, resized_shape):
     if isinstance(original_shape, int):
         original_shape = (original_shape, original_shape)
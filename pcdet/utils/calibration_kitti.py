@@ -40,6 +40,24 @@ class Calibration(object):
         self.R0 = calib["R0"]  # 3 x 3
         self.V2C = calib["Tr_velo2cam"]  # 3 x 4
 
+        self._init_intrinsics()
+
+    @classmethod
+    def from_arrays(cls, P2, R0, V2C):
+        """Build a Calibration from cached matrices without reading a file.
+
+        Accepts the (4, 4) extended matrices stored in kitti infos and
+        slices them back to the shapes the file parser produces.
+        """
+        return cls(
+            {
+                "P2": np.asarray(P2, dtype=np.float32)[:3, :4],
+                "R0": np.asarray(R0, dtype=np.float32)[:3, :3],
+                "Tr_velo2cam": np.asarray(V2C, dtype=np.float32)[:3, :4],
+            }
+        )
+
+    def _init_intrinsics(self):
         # Camera intrinsics and extrinsics
         self.cu = self.P2[0, 2]
         self.cv = self.P2[1, 2]
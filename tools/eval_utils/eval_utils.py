@@ -4,6 +4,7 @@ import os
 import os.path as osp
 import pickle
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 
 # from src.bounding_box import BoundingBox
@@ -139,6 +140,11 @@ def eval_one_epoch(
         with open(result_dir / "result.pkl", "rb") as f:
             det_annos = pickle.load(f)
     else:
+        # finalize predictions (D2H copies, KITTI-format conversion, label
+        # file writes) on a worker thread so the CPU work overlaps the next
+        # batch's forward pass; futures keep det_annos in loader order
+        finalize_pool = ThreadPoolExecutor(max_workers=1)
+        anno_futures = []
         for i, batch_dict in enumerate(dataloader):
             if debug and i > 50:
                 break
@@ -147,18 +153,24 @@ def eval_one_epoch(
                 pred_dicts, ret_dict = model(batch_dict)
             disp_dict = {}
             statistics_info(cfg, ret_dict, metric, disp_dict)
-            annos = dataset.generate_prediction_dicts(
-                batch_dict,
-                pred_dicts,
-                class_names,
-                output_path=final_output_dir if save_to_file else None,
+            anno_futures.append(
+                finalize_pool.submit(
+                    dataset.generate_prediction_dicts,
+                    batch_dict,
+                    pred_dicts,
+                    class_names,
+                    output_path=final_output_dir if save_to_file else None,
+                )
             )
-            det_annos += annos
 
             if cfg.LOCAL_RANK == 0:
                 progress_bar.set_postfix(disp_dict)
                 progress_bar.update()
 
+        for future in anno_futures:
+            det_annos += future.result()
+        finalize_pool.shutdown()
+
     if cfg.LOCAL_RANK == 0:
         progress_bar.close()
 